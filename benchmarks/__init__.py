@@ -0,0 +1,5 @@
+"""
+Замеры производительности примеров паттернов
+
+Каждый модуль пакета запускается отдельно, например: python -m benchmarks.memory
+"""
@@ -0,0 +1,51 @@
+"""
+Адаптация фигур TextShape: по одной через пары Point против пакетного TextShapeBatch над массивами углов
+
+Для count случайных прямоугольников замеряется:
+ - TextShape.bounding_box на каждую фигуру (как в приложении сейчас, с общим TextView)
+ - TextShapeBatch.bounding_box на все фигуры разом в колоночный TextViewStore
+и проверяется, что обе реализации дают одинаковые TextView
+
+Запуск: python -m benchmarks.adapter [число фигур]
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import sys
+import time
+
+import numpy as np
+
+from structural.adapter import Point, TextShape, TextView
+from structural.adapter_batch import TextShapeBatch, TextViewStore
+
+
+def main(count: int = 1_000_000, seed: int = 1):
+    generator = np.random.default_rng(seed)
+    bottom_left = generator.integers(0, 1000, size=(2, count))
+    top_right = bottom_left + generator.integers(1, 100, size=(2, count))
+
+    points = [(Point(x1, y1), Point(x2, y2))
+              for x1, y1, x2, y2 in zip(*bottom_left.tolist(), *top_right.tolist())]
+    shape = TextShape(TextView())
+    infos = []
+    started = time.perf_counter()
+    for corners in points:
+        shape.bounding_box(*corners)
+        infos.append(shape.text_view.get_info())
+    single = time.perf_counter() - started
+
+    shapes = TextShapeBatch(TextViewStore(count))
+    started = time.perf_counter()
+    shapes.bounding_box(bottom_left, top_right)
+    batch = time.perf_counter() - started
+
+    if not np.array_equal(np.array(infos).T, shapes.text_views.get_info()):
+        raise Exception('Результаты адаптеров не совпадают!')
+    print(f'TextShape по одной: {single:.3f} с, {count / single:12.0f} фигур/с')
+    print(f'TextShapeBatch:     {batch:.3f} с, {count / batch:12.0f} фигур/с, быстрее в {single / batch:.0f} раз')
+    return {'single': single, 'batch': batch}
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,177 @@
+"""
+Сравнение порождающих паттернов на лабиринтах заданного размера
+
+Каждый способ постройки (абстрактные фабрики, фабричные методы MazeGame, строитель, прототипы) собирает один и тот же
+лабиринт W x H. Для каждого замеряются:
+ - время постройки и число созданных объектов в секунду
+ - пиковая память при постройке (tracemalloc, отдельный прогон, так как трассировка замедляет работу)
+ - время одного вызова make_* (build_* у строителя)
+Результаты печатаются и, если указан --output, сохраняются в JSON для сравнения между релизами
+
+Запуск: python -m benchmarks.factories --width 200 --height 200 --output factories.json
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from generating.abstract_factory import MazeFactory, EnchantedMazeFactory, BombedMazeFactory
+from generating.builder import CoordinateMazeBuilder
+from generating.common import Direction
+from generating.factory_method import MazeGame, BombedMazeGame, EnchantedMazeGame
+from generating.generator import build_maze, carve, room_coordinates
+from generating.prototype import (
+    MazePrototypeFactory, Maze as PrototypeMaze, Wall as PrototypeWall, BombedWall as PrototypeBombedWall,
+    Room as PrototypeRoom, RoomWithABomb as PrototypeRoomWithABomb, Door as PrototypeDoor,
+)
+from generating.streaming import consume, stream_maze
+from helpers import NullSink, creation_events
+
+
+def factories() -> Dict[str, Callable[[], object]]:
+    """Способы постройки через фабрику: имя -> функция создания фабрики"""
+    return {
+        'MazeFactory': MazeFactory,
+        'EnchantedMazeFactory': EnchantedMazeFactory,
+        'BombedMazeFactory': BombedMazeFactory,
+        'MazeFactory(pooled)': lambda: MazeFactory(pooled=True),
+        'BombedMazeFactory(pooled)': lambda: BombedMazeFactory(pooled=True),
+        'MazeGame': MazeGame,
+        'EnchantedMazeGame': EnchantedMazeGame,
+        'BombedMazeGame': BombedMazeGame,
+        'MazePrototypeFactory': lambda: MazePrototypeFactory(
+            PrototypeMaze(), PrototypeWall(), PrototypeRoom(), PrototypeDoor()
+        ),
+        'BombedMazePrototypeFactory': lambda: MazePrototypeFactory(
+            PrototypeMaze(), PrototypeBombedWall(), PrototypeRoomWithABomb(), PrototypeDoor()
+        ),
+    }
+
+
+def count_objects(maze) -> int:
+    """Число различных объектов лабиринта: комнаты и их стороны"""
+    sides = set()
+    rooms = maze.get_rooms()
+    for room in rooms:
+        for direction in Direction:
+            side = room.get_side(direction)
+            if side is not None:
+                sides.add(id(side))
+    return len(rooms) + len(sides)
+
+
+def time_calls(calls: Dict[str, Callable[[], object]], count: int) -> Dict[str, float]:
+    """Среднее время одного вызова каждой функции в микросекундах"""
+    result = {}
+    for name, call in calls.items():
+        started = time.perf_counter()
+        for _ in range(count):
+            call()
+        result[name] = (time.perf_counter() - started) / count * 1e6
+    return result
+
+
+def measure(build: Callable[[], object], calls: Dict[str, Callable[[], object]], count: int) -> dict:
+    """Замерить один способ постройки"""
+    started = time.perf_counter()
+    maze = build()
+    elapsed = time.perf_counter() - started
+    objects = count_objects(maze)
+    del maze
+
+    tracemalloc.start()
+    build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'build_s': elapsed,
+        'objects': objects,
+        'objects_per_s': objects / elapsed,
+        'peak_bytes': peak,
+        'us_per_call': time_calls(calls, count),
+    }
+
+
+def factory_case(factory, openings: bytearray, width: int, height: int):
+    def build():
+        return build_maze(factory, width, height, openings)
+
+    room1, room2 = factory.make_room(1), factory.make_room(2)
+    calls = {
+        'make_room': lambda: factory.make_room(1),
+        'make_wall': factory.make_wall,
+        'make_door': lambda: factory.make_door(room1, room2),
+    }
+    return build, calls
+
+
+def builder_case(width: int, height: int, seed: int):
+    def build():
+        return consume(stream_maze(width, height, seed), CoordinateMazeBuilder(lambda no: room_coordinates(no, width)))
+
+    builder = CoordinateMazeBuilder()
+    builder.build_maze()
+    numbers = iter(range(1, 1 << 62))
+
+    def build_room():
+        room = next(numbers)
+        builder.build_room(room, room, 0)
+
+    def build_door():
+        room1, room2 = next(numbers), next(numbers)
+        builder.build_room(room1, room1, 0)
+        builder.build_room(room2, room2, 0)
+        builder.build_door(room1, room2)
+
+    calls = {
+        'build_room': build_room,
+        'build_room+build_room+build_door': build_door,
+    }
+    return build, calls
+
+
+def run(width: int, height: int, calls: int, seed: int = 1) -> dict:
+    """Прогнать все способы постройки"""
+    openings = carve(width, height, seed=seed)
+    results = {}
+    with creation_events.use(NullSink()):
+        for name, make_factory in factories().items():
+            results[name] = measure(*factory_case(make_factory(), openings, width, height), calls)
+        results['CoordinateMazeBuilder'] = measure(*builder_case(width, height, seed), calls)
+    return {
+        'python': platform.python_version(),
+        'width': width,
+        'height': height,
+        'calls': calls,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сравнение порождающих паттернов')
+    parser.add_argument('--width', type=int, default=100)
+    parser.add_argument('--height', type=int, default=100)
+    parser.add_argument('--calls', type=int, default=10000, help='число вызовов для замера make_*')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='куда сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args.width, args.height, args.calls, args.seed)
+    for name, result in report['results'].items():
+        calls = ', '.join(f'{call} {us:.2f} мкс' for call, us in result['us_per_call'].items())
+        print(f'{name:>28}: {result["build_s"]:6.2f} с, {result["objects_per_s"]:10.0f} объектов/с, '
+              f'пик {result["peak_bytes"] / 2 ** 20:7.1f} МБ; {calls}')
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Замер памяти и аллокаций на одну комнату лабиринта
+
+Сравниваются текущие классы generating/common.py (со __slots__ и навигацией в списке) с прежней раскладкой, где у
+каждого объекта был свой __dict__, а навигация комнаты хранилась в словаре. Прежняя раскладка воспроизведена здесь же,
+чтобы сравнение было честным и не зависело от истории репозитория
+
+Запуск: python -m benchmarks.memory [количество комнат]
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import sys
+import time
+import tracemalloc
+
+from generating.common import Direction, Room, Wall
+from helpers import NullSink, creation_events
+
+
+class DictRoom:
+    """Комната в прежней раскладке: словарь экземпляра и словарь навигации"""
+    def __init__(self, no: int):
+        self.navigation = {way: None for way in Direction}
+        self.room_no = no
+
+    def set_side(self, direction: Direction, obj):
+        self.navigation[direction] = obj
+
+
+class DictWall:
+    """Стена в прежней раскладке"""
+
+
+def measure(room_class, wall_class, rooms: int) -> dict:
+    """
+    Построить комнаты с 4 стенами и замерить память
+    :param room_class: класс комнаты
+    :param wall_class: класс стены
+    :param rooms: количество комнат
+    :return: байт и аллокаций на комнату, время на комнату в мкс
+    """
+    with creation_events.use(NullSink()):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        built = []
+        for no in range(rooms):
+            room = room_class(no)
+            for way in Direction:
+                room.set_side(way, wall_class())
+            built.append(room)
+        elapsed = time.perf_counter() - started
+        stats = tracemalloc.take_snapshot().compare_to(before, 'filename')
+        tracemalloc.stop()
+    size = sum(stat.size_diff for stat in stats)
+    count = sum(stat.count_diff for stat in stats)
+    return {
+        'bytes_per_room': size / rooms,
+        'allocs_per_room': count / rooms,
+        'us_per_room': elapsed / rooms * 1e6,
+    }
+
+
+def main(rooms: int = 100_000):
+    results = {
+        'dict': measure(DictRoom, DictWall, rooms),
+        'slots': measure(Room, Wall, rooms),
+    }
+    for name, result in results.items():
+        print('{name:>6}: {bytes_per_room:8.1f} байт/комнату, {allocs_per_room:5.1f} аллокаций/комнату, '
+              '{us_per_room:6.2f} мкс/комнату'.format(name=name, **result))
+    saving = results['dict']['bytes_per_room'] - results['slots']['bytes_per_room']
+    print(f'Экономия: {saving:.1f} байт на комнату')
+    return results
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,44 @@
+"""
+Масштабирование параллельной генерации лабиринта по числу процессов
+
+Для каждого числа процессов замеряется время до готового лабиринта (полосы построены, склеены и сшиты) и время, за
+которое в родительском процессе создаются все комнаты. Ускорение считается относительно 1 процесса
+
+Запуск: python -m benchmarks.parallel [ширина] [высота]
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import os
+import sys
+import time
+
+from generating.abstract_factory import MazeFactory
+from generating.parallel import generate_parallel
+from helpers import NullSink, creation_events
+
+
+WORKERS = (1, 2, 4, 8)
+
+
+def main(width: int = 500, height: int = 500, seed: int = 1):
+    print(f'Лабиринт {width} x {height}, доступно процессоров: {os.cpu_count()}')
+    results = {}
+    with creation_events.use(NullSink()):
+        for workers in WORKERS:
+            started = time.perf_counter()
+            maze = generate_parallel(MazeFactory(), width, height, workers, seed=seed)
+            ready = time.perf_counter() - started
+            maze.materialize_all()
+            total = time.perf_counter() - started
+            results[workers] = {'ready_s': ready, 'materialized_s': total}
+    base = results[WORKERS[0]]['ready_s']
+    for workers, result in results.items():
+        print('{workers} процессов: готов за {ready_s:6.2f} с (ускорение {speedup:4.2f}x), '
+              'все комнаты созданы за {materialized_s:6.2f} с'.format(
+                  workers=workers, speedup=base / result['ready_s'], **result))
+    return results
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
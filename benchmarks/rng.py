@@ -0,0 +1,83 @@
+"""
+Выбор заклинаний и урона бомб: глобальный random.randint в конструкторе против потока случайных чисел фабрики
+
+Для каждого вида продуктов замеряется создание count объектов:
+ - по одному конструктором без параметров (random.randint на каждый объект)
+ - пачкой через make_rooms/make_doors фабрики с зерном (одна блочная выборка RandomStream на пачку)
+Отдельно замеряется только выборка чисел и проверяется, что при одном зерне результат не зависит от размера пачки
+
+Запуск: python -m benchmarks.rng [число объектов]
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import random
+import sys
+import time
+from typing import Callable
+
+from generating.abstract_factory import (
+    BOMB_DAMAGE, EnchantedDoor, EnchantedMazeFactory, EnchantedRoom, BombedMazeFactory, RoomWithBomb,
+)
+from generating.randomness import RandomStream
+from helpers import NullSink, creation_events
+
+
+BATCH_SIZES = (1, 1000, 65536)
+
+
+def timed(call: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started
+
+
+def batched_states(make_factory: Callable[[], object], count: int, batch: int) -> list:
+    """Состояния count комнат, созданных пачками размера batch"""
+    factory = make_factory()
+    states = []
+    for start in range(0, count, batch):
+        states.extend(room.get_state() for room in factory.make_rooms(range(start, min(start + batch, count))))
+    return states
+
+
+def main(count: int = 1_000_000, seed: int = 1):
+    print(f'Объектов: {count}')
+    with creation_events.use(NullSink()):
+        pairs = [(EnchantedRoom(1, 1), EnchantedRoom(2, 1))] * count
+    cases = {
+        'random.randint': (
+            lambda: [random.randint(1, 200) for _ in range(count)],
+            lambda: [BOMB_DAMAGE[word % len(BOMB_DAMAGE)] for word in RandomStream(seed).words(count)],
+        ),
+        'EnchantedRoom': (
+            lambda: [EnchantedRoom(no) for no in range(count)],
+            lambda: EnchantedMazeFactory(seed=seed).make_rooms(range(count)),
+        ),
+        'EnchantedDoor': (
+            lambda: [EnchantedDoor(r1, r2) for r1, r2 in pairs],
+            lambda: EnchantedMazeFactory(seed=seed).make_doors(pairs),
+        ),
+        'RoomWithBomb': (
+            lambda: [RoomWithBomb(no) for no in range(count)],
+            lambda: BombedMazeFactory(seed=seed).make_rooms(range(count)),
+        ),
+    }
+    results = {}
+    with creation_events.use(NullSink()):
+        for name, (one_by_one, batched) in cases.items():
+            results[name] = {'global_s': timed(one_by_one), 'stream_s': timed(batched)}
+            print('{name:>15}: по одному {global_s:6.2f} с, пачкой {stream_s:6.2f} с (ускорение {speedup:4.2f}x)'.format(
+                name=name, speedup=results[name]['global_s'] / results[name]['stream_s'], **results[name]))
+
+        sample = min(count, 100_000)
+        for make_factory in (lambda: EnchantedMazeFactory(seed=seed), lambda: BombedMazeFactory(seed=seed)):
+            states = [batched_states(make_factory, sample, batch) for batch in BATCH_SIZES]
+            same = all(other == states[0] for other in states[1:])
+            print(f'{type(make_factory()).__name__}: результат при пачках {BATCH_SIZES} '
+                  f'{"совпадает" if same else "РАЗЛИЧАЕТСЯ"}')
+    return results
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""
+Одиночка под конкуренцией потоков
+
+Сравниваются прежний декоратор-замыкание (воспроизведен здесь же) и текущий generating/singleton.py:
+ - гонка первого создания: потоки одновременно вызывают класс с медленным конструктором, считается, сколько
+   экземпляров было создано (должен быть 1)
+ - быстрый путь: все потоки многократно получают уже созданный экземпляр, считаются вызовы в секунду
+
+Запуск: python -m benchmarks.singleton [вызовов на поток]
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import sys
+import threading
+import time
+
+from generating.singleton import reset, singleton
+
+
+THREADS = (1, 4, 16)
+
+
+def closure_singleton(class_):
+    """Прежний декоратор: проверка и создание без блокировки, класс подменяется функцией"""
+    instances = {}
+
+    def getinstance(*args, **kwargs):
+        if class_ not in instances:
+            instances[class_] = class_(*args, **kwargs)
+        return instances[class_]
+    return getinstance
+
+
+def make_factory(decorator):
+    """Класс-одиночка с медленным конструктором, который считает созданные экземпляры"""
+    class SlowFactory:
+        created = 0
+
+        def __init__(self):
+            time.sleep(0.01)
+            SlowFactory.created += 1
+
+    return SlowFactory, decorator(SlowFactory)
+
+
+def run_threads(threads: int, target) -> float:
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        target()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main(calls: int = 200_000):
+    results = {}
+    for name, decorator in (('closure', closure_singleton), ('SingletonMeta', singleton)):
+        for threads in THREADS:
+            cls, factory = make_factory(decorator)
+            run_threads(threads, factory)
+            created = cls.created
+
+            def get_many():
+                for _ in range(calls):
+                    factory()
+
+            elapsed = run_threads(threads, get_many)
+            results[name, threads] = {'created': created, 'calls_per_s': threads * calls / elapsed}
+            print(f'{name:>13}, потоков {threads:2}: создано экземпляров {created}, '
+                  f'{results[name, threads]["calls_per_s"]:12.0f} вызовов/с')
+            if isinstance(factory, type):
+                reset(factory)
+    return results
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
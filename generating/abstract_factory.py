@@ -11,25 +11,45 @@
 __author__ = 'Мауталиев С. И.'
 
 import random
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from generating.common import Wall, Door, Room, Maze, Direction
+from generating.common import MapSite, Wall, Door, Room, Maze, Direction
+from generating.randomness import RandomStream
+
+
+# Номера заклинаний зачарованных продуктов и возможный урон бомбы. Фабрики выбирают из них значения своим потоком
+# случайных чисел: по одному 64-битному числу на объект, поэтому при одинаковом зерне результат не зависит от того,
+# создаются объекты по одному или пачками любого размера
+SPELL_NUMBERS = (1, 2, 3)
+BOMB_DAMAGE = range(1, 201)
 
 
 # Создадим класс абстракной фабрики для построения лабиринта
 # В этой реализации абстракная фабрика будет и конкретной фабрикой, для создания простого лабиринта "без наворочек"
 class MazeFactory:
-    def __init__(self):
-        pass
+    def __init__(self, pooled: bool = False):
+        """
+        :param pooled: режим пула. Стены выдаются одним общим экземпляром на фабрику: у простой стены нет состояния,
+        а стены с состоянием (BombedWall) копируются при первом изменении
+        """
+        self.pooled = pooled
+        self.__pool: Dict[type, MapSite] = {}
+
+    def _pooled(self, cls: type, **kwargs) -> MapSite:
+        """Общий экземпляр продукта класса cls для режима пула"""
+        product = self.__pool.get(cls)
+        if product is None:
+            product = self.__pool[cls] = cls(**kwargs)
+        return product
 
     @staticmethod
     def make_maze() -> Maze:
         """Создать лабиринт"""
         return Maze()
 
-    @staticmethod
-    def make_wall() -> Wall:
+    def make_wall(self) -> Wall:
         """Создать стену"""
-        return Wall()
+        return self._pooled(Wall) if self.pooled else Wall()
 
     @staticmethod
     def make_room(room_no: int) -> Room:
@@ -39,45 +59,78 @@ class MazeFactory:
     def make_door(room1: Room, room2: Room) -> Door:
         return Door(room1, room2)
 
+    # Пакетное создание продуктов. По умолчанию - просто цикл по make_*, а конкретные фабрики могут
+    # переопределить их, чтобы подготовить данные для всех объектов разом (например, выбрать заклинания)
+    def make_rooms(self, numbers: Iterable[int]) -> List[Room]:
+        """Создать комнаты с заданными номерами"""
+        make_room = self.make_room
+        return [make_room(no) for no in numbers]
+
+    def make_walls(self, count: int) -> List[Wall]:
+        """Создать count стен. В режиме пула это count ссылок на общую стену"""
+        if self.pooled:
+            return [self.make_wall()] * count
+        make_wall = self.make_wall
+        return [make_wall() for _ in range(count)]
+
+    def make_doors(self, pairs: Iterable[Tuple[Room, Room]]) -> List[Door]:
+        """Создать двери между парами комнат"""
+        make_door = self.make_door
+        return [make_door(room1, room2) for room1, room2 in pairs]
+
 
 # Создадим необходимые подклассы для первой конкретной фабрики
 class EnchantedRoom(Room):
     """Зачарованная комната"""
+    __slots__ = ('__spell',)
     __spell_dict = {
         1: 'Абра-кадавра',
         2: 'Авада-кедавра',
         3: 'Фокус-покус',
     }
 
-    def __init__(self, no: int, ):
+    def __init__(self, no: int, spell: Optional[int] = None):
         super().__init__(no)
 
         # Отличительная особенность конкретного продукта от абстракного
-        # Пусть будет какая-то фигня в виде магической речи
-        self.__spell = self.__cast_spell()
+        # Пусть будет какая-то фигня в виде магической речи. Номер заклинания может выбрать фабрика
+        self.__spell = self.__spell_dict[spell] if spell else self.__cast_spell()
 
     def __cast_spell(self):
         return self.__spell_dict.get(random.randint(1, 3))
 
+    def get_state(self) -> int:
+        return next(key for key, spell in self.__spell_dict.items() if spell == self.__spell)
+
+    def set_state(self, state: int):
+        self.__spell = self.__spell_dict[state]
+
 
 class EnchantedDoor(Door):
     """Зачарованная дверь"""
+    __slots__ = ('__spell',)
     __spell_dict = {
         1: 'Абра-кадавра',
         2: 'Авада-кедавра',
         3: 'Фокус-покус',
     }
 
-    def __init__(self, door1: EnchantedRoom, door2: EnchantedRoom):
+    def __init__(self, door1: EnchantedRoom, door2: EnchantedRoom, spell: Optional[int] = None):
         super().__init__(door1, door2)
 
         # Отличительная особенность конкретного продукта от абстракного
-        # Пусть будет какая-то фигня в виде магической речи
-        self.__spell = self.__cast_spell()
+        # Пусть будет какая-то фигня в виде магической речи. Номер заклинания может выбрать фабрика
+        self.__spell = self.__spell_dict[spell] if spell else self.__cast_spell()
 
     def __cast_spell(self):
         return self.__spell_dict.get(random.randint(1, 3))
 
+    def get_state(self) -> int:
+        return next(key for key, spell in self.__spell_dict.items() if spell == self.__spell)
+
+    def set_state(self, state: int):
+        self.__spell = self.__spell_dict[state]
+
     def enter(self, **kwargs):
         if kwargs.get('spell') == self.__spell:
             super().enter(**kwargs)
@@ -87,52 +140,122 @@ class EnchantedDoor(Door):
 
 # Конкретная фабрика создает конкретную реализацию наших объектов по интерфейсу, представляемым абстракной
 class EnchantedMazeFactory(MazeFactory):
-    @staticmethod
-    def make_room(room_no: int) -> EnchantedRoom:
-        return EnchantedRoom(room_no)
+    def __init__(self, pooled: bool = False, seed: Optional[int] = None):
+        """:param seed: зерно потока случайных чисел фабрики, из которого выбираются заклинания"""
+        super().__init__(pooled)
+        self.__stream = RandomStream(seed)
 
-    @staticmethod
-    def make_door(room1: EnchantedRoom, room2: EnchantedRoom) -> EnchantedDoor:
-        return EnchantedDoor(room1, room2)
+    def reseed(self, seed: Optional[int]):
+        """Начать поток случайных чисел фабрики заново с зерном seed (например, свое зерно у каждой части лабиринта)"""
+        self.__stream = RandomStream(seed)
+
+    def __spells(self, count: int) -> List[int]:
+        return [SPELL_NUMBERS[word % len(SPELL_NUMBERS)] for word in self.__stream.words(count)]
+
+    def make_room(self, room_no: int) -> EnchantedRoom:
+        return EnchantedRoom(room_no, SPELL_NUMBERS[self.__stream.below(len(SPELL_NUMBERS))])
+
+    def make_door(self, room1: EnchantedRoom, room2: EnchantedRoom) -> EnchantedDoor:
+        return EnchantedDoor(room1, room2, SPELL_NUMBERS[self.__stream.below(len(SPELL_NUMBERS))])
+
+    def make_rooms(self, numbers: Iterable[int]) -> List[EnchantedRoom]:
+        numbers = list(numbers)
+        return [EnchantedRoom(no, spell) for no, spell in zip(numbers, self.__spells(len(numbers)))]
+
+    def make_doors(self, pairs: Iterable[Tuple[EnchantedRoom, EnchantedRoom]]) -> List[EnchantedDoor]:
+        pairs = list(pairs)
+        return [EnchantedDoor(room1, room2, spell) for (room1, room2), spell in zip(pairs, self.__spells(len(pairs)))]
 
 
 # Создадим конкретные продукты для второй конкретной фабрики
 class BombedWall(Wall):
-    def __init__(self):
+    __slots__ = ('__durability', 'shared')
+
+    def __init__(self, shared: bool = False):
         super().__init__()
 
         # Эта стена может взрываться, а значит имеет прочность
         self.__durability = 100
+        # Общая стена из пула фабрики. Менять ее нельзя: владелец сначала заменяет ее своей копией
+        self.shared = shared
+
+    def __check_own(self):
+        if self.shared:
+            raise ValueError('Общую стену из пула нельзя изменять, сначала нужно сделать копию')
+
+    def copy(self) -> 'BombedWall':
+        """Собственная (не общая) копия стены"""
+        wall = BombedWall()
+        wall.__durability = self.__durability
+        return wall
 
     def blew_up(self, damage):
+        self.__check_own()
         self.__durability -= damage
 
+    def get_state(self) -> int:
+        return self.__durability
+
+    def set_state(self, state: int):
+        self.__check_own()
+        self.__durability = state
+
 
 class RoomWithBomb(Room):
-    def __init__(self, no: int):
+    __slots__ = ('__bomb_damage',)
+
+    def __init__(self, no: int, bomb_damage: Optional[int] = None):
         super().__init__(no)
 
-        # Пусть в этой комнате будет бомба с рандомным уроном
-        self.__bomb_damage = random.randint(1, 200)
+        # Пусть в этой комнате будет бомба с рандомным уроном. Урон может выбрать фабрика
+        self.__bomb_damage = bomb_damage or random.randint(1, 200)
+
+    def get_state(self) -> int:
+        return self.__bomb_damage
+
+    def set_state(self, state: int):
+        self.__bomb_damage = state
 
     def enter(self):
         # При входе в эту комнату стены могут взорваться
         # Паттерн обеспечивает нам то, что у всех стен этой комнаты будет метод blew_up
-        for direction in self.__navigation:
-            if type(self.get_side(direction)) == BombedWall:
-                self.get_side(direction).blew_up(self.__bomb_damage)
+        for direction in Direction:
+            side = self.get_side(direction)
+            if type(side) == BombedWall:
+                if side.shared:
+                    # Копирование при записи: общая стена из пула заменяется собственной копией этой комнаты
+                    side = side.copy()
+                    self.set_side(direction, side)
+                side.blew_up(self.__bomb_damage)
         super().enter()
 
 
 # Создадим вторую конкретную фабрику, стены которой могут взрываться
 class BombedMazeFactory(MazeFactory):
-    @staticmethod
-    def make_wall() -> BombedWall:
-        return BombedWall()
-
-    @staticmethod
-    def make_room(room_no: int) -> RoomWithBomb:
-        return RoomWithBomb(room_no)
+    def __init__(self, pooled: bool = False, seed: Optional[int] = None):
+        """:param seed: зерно потока случайных чисел фабрики, из которого выбирается урон бомб"""
+        super().__init__(pooled)
+        self.__stream = RandomStream(seed)
+
+    def reseed(self, seed: Optional[int]):
+        """Начать поток случайных чисел фабрики заново с зерном seed (например, свое зерно у каждой части лабиринта)"""
+        self.__stream = RandomStream(seed)
+
+    def make_wall(self) -> BombedWall:
+        return self._pooled(BombedWall, shared=True) if self.pooled else BombedWall()
+
+    def make_room(self, room_no: int) -> RoomWithBomb:
+        return RoomWithBomb(room_no, BOMB_DAMAGE[self.__stream.below(len(BOMB_DAMAGE))])
+
+    def make_rooms(self, numbers: Iterable[int]) -> List[RoomWithBomb]:
+        numbers = list(numbers)
+        damages = [BOMB_DAMAGE[word % len(BOMB_DAMAGE)] for word in self.__stream.words(len(numbers))]
+        return [RoomWithBomb(no, damage) for no, damage in zip(numbers, damages)]
+
+    def make_walls(self, count: int) -> List[BombedWall]:
+        if self.pooled:
+            return super().make_walls(count)
+        return [BombedWall() for _ in range(count)]
 
 
 def create_maze(factory: MazeFactory) -> Maze:
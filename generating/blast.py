@@ -0,0 +1,190 @@
+"""
+Симуляция взрывов в лабиринтах BombedMazeFactory
+
+RoomWithBomb.enter взрывает стены по одной в цикле Python. Для тысяч взрывов за кадр это слишком медленно, поэтому
+BlastSimulation один раз переносит лабиринт в массивы NumPy:
+ - прочности всех BombedWall лежат в одном массиве, а таблица (комната, сторона) -> стена связывает их с комнатами
+ - урон бомб комнат и соседи комнат через двери тоже хранятся массивами
+
+Один такт (tick) обрабатывает все бомбы, взорвавшиеся одновременно:
+ 1. Поле урона: в комнате бомбы урон равен урону бомбы. Если задан радиус, урон за каждый шаг через дверь умножается
+    на falloff; от нескольких бомб в комнату приходит наибольший урон
+ 2. Урон поля вычитается из прочности стен всех задетых комнат одним np.bincount
+ 3. Цепная реакция: бомбы, до которых дошел урон не меньше chain_threshold, взрываются на следующем такте
+
+Сам лабиринт при этом не меняется, прочности записываются в стены методом sync. Общие стены из пула фабрики
+(MazeFactory(pooled=True)) симулируются отдельно для каждой стороны комнаты, а при sync копируются при записи
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from generating.abstract_factory import BombedWall, RoomWithBomb
+from generating.common import NAVIGATION_SIZE, Direction
+
+
+@dataclass
+class BlastReport:
+    """Итог такта: номера взорвавшихся комнат и индексы разрушенных за такт стен в BlastSimulation.walls"""
+    tick: int
+    detonated: np.ndarray
+    destroyed: np.ndarray
+
+
+class BlastSimulation:
+    """Векторная симуляция взрывов"""
+    def __init__(self, maze, radius: int = 0, falloff: float = 0.5, chain_threshold: Optional[float] = None):
+        """
+        :param maze: лабиринт с комнатами RoomWithBomb и стенами BombedWall
+        :param radius: на сколько дверей от комнаты бомбы распространяется взрыв
+        :param falloff: множитель урона за каждый шаг через дверь
+        :param chain_threshold: урон, от которого взрывается бомба соседней комнаты. None - без цепной реакции
+        """
+        if radius < 0:
+            raise ValueError('Радиус взрыва не может быть отрицательным')
+        self.__maze = maze
+        self.__radius = radius
+        self.__falloff = falloff
+        self.__chain_threshold = chain_threshold
+        self.__tick = 0
+
+        rooms = maze.get_rooms()
+        self.__rooms = rooms
+        self.__index = {room.room_no: position for position, room in enumerate(rooms)}
+        side_wall = np.full((len(rooms), NAVIGATION_SIZE), -1, dtype=np.int64)
+        neighbours = np.full((len(rooms), NAVIGATION_SIZE), -1, dtype=np.int64)
+        # Общая стена пула получает свою запись для каждой стороны комнаты, иначе урон одной комнаты достался бы всем
+        walls: List[BombedWall] = []
+        owners: list = []
+        wall_index = {}
+        for position, room in enumerate(rooms):
+            for direction in Direction:
+                side = room.get_side(direction)
+                if isinstance(side, BombedWall):
+                    key = (position, direction) if side.shared else id(side)
+                    ref = wall_index.get(key)
+                    if ref is None:
+                        ref = wall_index[key] = len(walls)
+                        walls.append(side)
+                        owners.append(key if side.shared else None)
+                    side_wall[position, direction - 1] = ref
+                elif side is not None and side.is_door:
+                    # Соседа ищем по номеру: у клонов лабиринта дверь может указывать на общую комнату-оригинал
+                    other = side.other_side_from(room)
+                    if other is not None:
+                        neighbours[position, direction - 1] = self.__index.get(other.room_no, -1)
+        self.__walls = walls
+        self.__owners = owners
+        self.__side_wall = side_wall
+        self.__neighbours = neighbours
+
+        self.__numbers = np.fromiter((room.room_no for room in rooms), dtype=np.int64, count=len(rooms))
+        self.__bombs = np.fromiter(
+            (room.get_state() if isinstance(room, RoomWithBomb) else 0 for room in rooms),
+            dtype=np.float64, count=len(rooms)
+        )
+        self.__durability = np.fromiter((wall.get_state() for wall in walls), dtype=np.float64, count=len(walls))
+        self.__synced = self.__durability.copy()
+        self.__exploded = np.zeros(len(rooms), dtype=bool)
+        self.__pending = np.zeros(len(rooms), dtype=bool)
+
+    @property
+    def walls(self) -> List[BombedWall]:
+        """Стены в порядке индексов BlastReport.destroyed"""
+        return self.__walls
+
+    @property
+    def durability(self) -> np.ndarray:
+        """Текущие прочности стен (только для чтения)"""
+        view = self.__durability.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def pending(self) -> int:
+        """Сколько бомб взорвется на следующем такте"""
+        return int(self.__pending.sum())
+
+    def detonate(self, room_numbers: Iterable[int]):
+        """Взорвать бомбы комнат на следующем такте. Уже взорвавшиеся бомбы и комнаты без бомб пропускаются"""
+        try:
+            positions = [self.__index[no] for no in room_numbers]
+        except KeyError as error:
+            raise ValueError(f'Комнаты {error.args[0]} нет в лабиринте') from None
+        self.__pending[positions] = True
+        self.__pending &= (self.__bombs > 0) & ~self.__exploded
+
+    def __blast_field(self, sources: np.ndarray) -> np.ndarray:
+        field = np.where(sources, self.__bombs, 0.0)
+        has_neighbour = self.__neighbours >= 0
+        for _ in range(self.__radius):
+            spread = np.where(has_neighbour, field[self.__neighbours], 0.0).max(axis=1, initial=0.0)
+            field = np.maximum(field, spread * self.__falloff)
+        return field
+
+    def tick(self) -> BlastReport:
+        """Взорвать все ожидающие бомбы одним векторным шагом"""
+        self.__tick += 1
+        sources = self.__pending
+        field = self.__blast_field(sources)
+        self.__exploded |= sources
+
+        has_wall = self.__side_wall >= 0
+        weights = np.broadcast_to(field[:, None], has_wall.shape)[has_wall]
+        hits = np.bincount(self.__side_wall[has_wall], weights=weights, minlength=len(self.__walls))
+        standing = self.__durability > 0
+        self.__durability -= np.floor(hits)
+        destroyed = np.flatnonzero(standing & (self.__durability <= 0))
+
+        if self.__chain_threshold is None:
+            self.__pending = np.zeros_like(sources)
+        else:
+            self.__pending = (field >= self.__chain_threshold) & (self.__bombs > 0) & ~self.__exploded
+        return BlastReport(self.__tick, self.__numbers[sources], destroyed)
+
+    def run(self, max_ticks: Optional[int] = None) -> List[BlastReport]:
+        """Выполнять такты, пока идет цепная реакция"""
+        reports = []
+        while self.__pending.any() and (max_ticks is None or len(reports) < max_ticks):
+            reports.append(self.tick())
+        return reports
+
+    def sync(self):
+        """Записать прочности в объекты стен. Общие стены пула заменяются в комнатах собственными копиями"""
+        for ref in np.flatnonzero(self.__durability != self.__synced).tolist():
+            wall = self.__walls[ref]
+            owner = self.__owners[ref]
+            if owner is not None:
+                position, direction = owner
+                wall = self.__walls[ref] = wall.copy()
+                # Через лабиринт, чтобы общая с клонами комната сначала скопировалась
+                room = self.__rooms[position] = self.__maze.own_room(self.__rooms[position].room_no)
+                room.set_side(direction, wall)
+                self.__owners[ref] = None
+            wall.set_state(int(self.__durability[ref]))
+        self.__synced = self.__durability.copy()
+
+
+if __name__ == '__main__':
+    import time
+
+    from generating.abstract_factory import BombedMazeFactory
+    from generating.generator import generate_maze
+    from generating.randomness import RandomStream
+    from helpers import NullSink, creation_events
+
+    with creation_events.use(NullSink()):
+        maze_ = generate_maze(BombedMazeFactory(pooled=True), 300, 300, seed=1)
+    simulation = BlastSimulation(maze_, radius=2, chain_threshold=150)
+    simulation.detonate(RandomStream(1).randints(1, len(maze_), 5000))
+    started = time.perf_counter()
+    for report in simulation.run():
+        print(f'Такт {report.tick}: взорвалось бомб {len(report.detonated)}, разрушено стен {len(report.destroyed)}')
+    print(f'Симуляция заняла {time.perf_counter() - started:.3f} с')
+    # sync копирует общие стены при записи, вывод о создании копий тоже отключаем
+    with creation_events.use(NullSink()):
+        simulation.sync()
@@ -11,9 +11,18 @@
 
 __author__ = 'Мауталиев С. И.'
 
-from typing import Optional, Type
+import itertools
+import math
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, TextIO, Tuple, Type
 
-from common import Maze, Room, Direction, Wall, Door
+from generating.common import Maze, Room, Direction, Wall, Door
+from generating.paths import Coordinates
+from helpers import NullSink, creation_events
 
 
 class MazeBuilder:
@@ -36,15 +45,31 @@ class MazeBuilder:
         raise NotImplementedError
 
 
+def _door_key(room1: int, room2: int) -> Tuple[int, int]:
+    return (room1, room2) if room1 <= room2 else (room2, room1)
+
+
 class StandardMazeBuilder(MazeBuilder):
     """
-    Класс строителя для постройки обычного лабиринта
+    Класс строителя для постройки обычного лабиринта.
+    Строитель помнит поставленные двери, поэтому готовый лабиринт можно перестраивать постепенно: apply_diff
+    добавляет, удаляет и переставляет только изменившиеся комнаты и двери
     """
-    def __init__(self):
-        self.__maze: Optional[Maze] = None
+    def __init__(self, maze: Optional[Maze] = None):
+        """:param maze: существующий лабиринт, который нужно перестраивать. Иначе его создает build_maze"""
+        self.__maze: Optional[Maze] = maze
+        self.__doors: Dict[Tuple[int, int], Door] = {}
+        if maze is not None:
+            for room in maze.get_rooms():
+                for way in Direction:
+                    side = room.get_side(way)
+                    if side is not None and side.is_door and None not in side.get_rooms():
+                        room1, room2 = side.get_rooms()
+                        self.__doors[_door_key(room1.room_no, room2.room_no)] = side
 
     def build_maze(self):
         self.__maze = Maze()
+        self.__doors = {}
 
     def build_room(self, room_no: int):
         if self.__maze.get_room(room_no):
@@ -61,10 +86,67 @@ class StandardMazeBuilder(MazeBuilder):
         for no, obj in rooms.items():
             if obj is None:
                 raise ValueError(f'Не существует комнаты с номером {no}')
-        r1, r2 = rooms[room1], rooms[room2]
+        # Стороны меняются у собственных копий комнат, если лабиринт делит комнаты с клонами (generating/prototype.py)
+        r1, r2 = self.__maze.own_room(room1), self.__maze.own_room(room2)
         door = Door(r1, r2)
         r1.set_side(self.__get_common_wall(r1, r2), door)
         r2.set_side(self.__get_common_wall(r2, r1), door)
+        self.__doors[_door_key(room1, room2)] = door
+
+    def remove_door(self, room1: int, room2: int):
+        """Убрать дверь между комнатами, на ее место в обеих комнатах встают стены"""
+        door = self.__doors.pop(_door_key(room1, room2), None)
+        if door is None:
+            raise ValueError(f'Между комнатами {room1} и {room2} нет двери')
+        for room in door.get_rooms():
+            if room.room_no in self.__maze:
+                room = self.__maze.own_room(room.room_no)
+            for way in Direction:
+                if room.get_side(way) is door:
+                    room.set_side(way, Wall())
+
+    def remove_room(self, room_no: int):
+        """Убрать комнату вместе с ее дверями"""
+        room = self.__maze.get_room(room_no)
+        if room is None:
+            raise ValueError(f'Не существует комнаты с номером {room_no}')
+        for way in Direction:
+            side = room.get_side(way)
+            if side is not None and side.is_door and None not in side.get_rooms():
+                key = _door_key(*(r.room_no for r in side.get_rooms()))
+                if self.__doors.get(key) is side:
+                    self.remove_door(*key)
+        self.__maze.remove_room(room_no)
+
+    def apply_diff(self, add_rooms: Iterable[int] = (), remove_rooms: Iterable[int] = (),
+                   add_doors: Iterable[Tuple[int, int]] = (), remove_doors: Iterable[Tuple[int, int]] = ()):
+        """
+        Перестроить лабиринт по изменениям. Время пропорционально размеру изменений, а не лабиринта.
+        Сначала убираются двери и комнаты, затем добавляются комнаты и двери
+        """
+        for room1, room2 in remove_doors:
+            self.remove_door(room1, room2)
+        for room_no in remove_rooms:
+            self.remove_room(room_no)
+        for room_no in add_rooms:
+            self.build_room(room_no)
+        for room1, room2 in add_doors:
+            self.build_door(room1, room2)
+
+    def apply_spec(self, rooms: Iterable[int], doors: Iterable[Tuple[int, int]]):
+        """
+        Привести лабиринт к новой спецификации: номерам комнат и дверям (парам номеров комнат).
+        Спецификация сравнивается с текущим лабиринтом операциями над множествами, а меняются только отличия
+        """
+        rooms = set(rooms)
+        doors = {_door_key(room1, room2) for room1, room2 in doors}
+        current_rooms = {room.room_no for room in self.__maze.get_rooms()}
+        removed_rooms = current_rooms - rooms
+        # Двери удаляемых комнат уберет remove_room
+        removed_doors = [
+            key for key in self.__doors.keys() - doors if key[0] not in removed_rooms and key[1] not in removed_rooms
+        ]
+        self.apply_diff(rooms - current_rooms, removed_rooms, doors - self.__doors.keys(), removed_doors)
 
     def get_maze(self) -> Maze:
         return self.__maze
@@ -76,9 +158,100 @@ class StandardMazeBuilder(MazeBuilder):
             side_room2 = room2.get_side(way)
             if side_room1 and side_room2 and isinstance(side_room1, Wall) and isinstance(side_room2, Wall):
                 return way
+        # Стороны комнат должны совпадать. Для сеток с несколькими дверями у комнаты есть CoordinateMazeBuilder
         raise ValueError('Между дверьми нет возможных общих стен')
 
 
+class CoordinateMazeBuilder(MazeBuilder):
+    """
+    Строитель лабиринта на сетке. Знает координаты (x, y) каждой комнаты и хранит словарь координаты -> комната,
+    поэтому дверь ставится на противоположные стороны соседних комнат за O(1), а не на первую попавшуюся общую стену.
+    Север - это y - 1, юг - y + 1, как в generating/generator.py
+    """
+    # Смещение соседа -> сторона первой комнаты, на которую ставится дверь
+    __DIRECTIONS = {
+        (0, -1): Direction.NORTH,
+        (1, 0): Direction.EAST,
+        (0, 1): Direction.SOUTH,
+        (-1, 0): Direction.WEST,
+    }
+    __OPPOSITE = {
+        Direction.NORTH: Direction.SOUTH,
+        Direction.EAST: Direction.WEST,
+        Direction.SOUTH: Direction.NORTH,
+        Direction.WEST: Direction.EAST,
+    }
+
+    def __init__(self, coordinates: Optional[Coordinates] = None):
+        """
+        :param coordinates: координаты комнаты по номеру (словарь или функция, например room_coordinates).
+        Без него координаты передаются в build_room
+        """
+        self.__coordinates = coordinates
+        self.__maze: Optional[Maze] = None
+        self.__cells: Dict[Tuple[int, int], Room] = {}
+        self.__positions: Dict[int, Tuple[int, int]] = {}
+
+    def build_maze(self):
+        self.__maze = Maze()
+        self.__cells = {}
+        self.__positions = {}
+
+    def __position_of(self, room_no: int) -> Tuple[int, int]:
+        if self.__coordinates is None:
+            raise ValueError(f'Не заданы координаты комнаты {room_no}')
+        if callable(self.__coordinates):
+            return self.__coordinates(room_no)
+        return self.__coordinates[room_no]
+
+    def build_room(self, room_no: int, x: Optional[int] = None, y: Optional[int] = None):
+        if room_no in self.__positions:
+            return
+        position = (x, y) if x is not None and y is not None else self.__position_of(room_no)
+        if position in self.__cells:
+            raise ValueError(f'Клетка {position} уже занята комнатой {self.__cells[position].room_no}')
+        room = Room(room_no)
+        room.set_side(Direction.NORTH, Wall())
+        room.set_side(Direction.SOUTH, Wall())
+        room.set_side(Direction.EAST, Wall())
+        room.set_side(Direction.WEST, Wall())
+        self.__maze.add_room(room)
+        self.__cells[position] = room
+        self.__positions[room_no] = position
+
+    def build_door(self, room1: int, room2: int):
+        for no in (room1, room2):
+            if no not in self.__positions:
+                raise ValueError(f'Не существует комнаты с номером {no}')
+        (x1, y1), (x2, y2) = self.__positions[room1], self.__positions[room2]
+        direction = self.__DIRECTIONS.get((x2 - x1, y2 - y1))
+        if direction is None:
+            raise ValueError(f'Комнаты {room1} и {room2} не соседние')
+        r1, r2 = self.__cells[x1, y1], self.__cells[x2, y2]
+        door = Door(r1, r2)
+        r1.set_side(direction, door)
+        r2.set_side(self.__OPPOSITE[direction], door)
+
+    def build_from_edges(self, edges: Iterable[Tuple[int, int]]):
+        """
+        Построить двери по потоку ребер (пар номеров комнат). Недостающие комнаты строятся по координатам из coordinates
+        """
+        build_room, build_door, positions = self.build_room, self.build_door, self.__positions
+        for room1, room2 in edges:
+            if room1 not in positions:
+                build_room(room1)
+            if room2 not in positions:
+                build_room(room2)
+            build_door(room1, room2)
+
+    def room_at(self, x: int, y: int) -> Optional[Room]:
+        """Комната в клетке (x, y)"""
+        return self.__cells.get((x, y))
+
+    def get_maze(self) -> Maze:
+        return self.__maze
+
+
 class CountingMazeBuilder(MazeBuilder):
     """
     Строитель, который только подсчитывает количество компонентов разного вида, которые могли бы быть созданы
@@ -101,6 +274,154 @@ class CountingMazeBuilder(MazeBuilder):
         return self.__rooms, self.__doors
 
 
+@dataclass
+class ProductCost:
+    """
+    Калиброванная стоимость одного продукта фабрики.
+    shared - фабрика на каждый вызов возвращает один и тот же экземпляр (например, стена MazeFactory(pooled=True)):
+    время тратится на каждый вызов, а объект в лабиринте один
+    """
+    name: str
+    bytes: float
+    seconds: float
+    shared: bool = False
+
+
+@dataclass
+class Estimate:
+    """Прогноз постройки: число объектов по классам, память в байтах и время в секундах"""
+    counts: Dict[str, int]
+    bytes: int
+    seconds: float
+
+    def fits(self, max_bytes: Optional[int] = None, max_seconds: Optional[float] = None) -> bool:
+        """Укладывается ли постройка в ограничения"""
+        return (max_bytes is None or self.bytes <= max_bytes) and (max_seconds is None or self.seconds <= max_seconds)
+
+    def shards(self, max_bytes: int) -> int:
+        """На сколько частей нужно разбить постройку, чтобы каждая уместилась в max_bytes"""
+        return max(1, math.ceil(self.bytes / max_bytes))
+
+
+def _measure(make: Callable[[int], object], samples: int) -> Tuple[float, float]:
+    """Байт и секунд на один вызов make. Время и память замеряются в разных прогонах: трассировка замедляет работу"""
+    made = []
+    started = time.perf_counter()
+    for index in range(samples):
+        made.append(make(index))
+    elapsed = time.perf_counter() - started
+    made.clear()
+    tracemalloc.start()
+    for index in range(samples):
+        made.append(make(index))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Ссылки в списке made к продукту не относятся
+    return (size - sys.getsizeof(made)) / samples, elapsed / samples
+
+
+def calibrate(factory, samples: int = 10000) -> Dict[str, ProductCost]:
+    """
+    Откалибровать стоимость продуктов фабрики: комнаты (вместе с добавлением в лабиринт), стены и двери,
+    а также установки стороны комнаты
+    :param factory: фабрика с интерфейсом make_maze/make_room/make_wall/make_door
+    :return: роль ('room', 'wall', 'door', 'side') -> стоимость
+    """
+    with creation_events.use(NullSink()):
+        maze = factory.make_maze()
+        room1, room2 = factory.make_room(1), factory.make_room(2)
+        wall = factory.make_wall()
+        names = {
+            'room': type(room1).__name__,
+            'wall': type(wall).__name__,
+            'door': type(factory.make_door(room1, room2)).__name__,
+            'side': 'set_side',
+        }
+        numbers = itertools.count(3)
+
+        def make_room(_):
+            maze.add_room(factory.make_room(next(numbers)))
+
+        makers = {
+            'room': make_room,
+            'wall': lambda _: factory.make_wall(),
+            'door': lambda _: factory.make_door(room1, room2),
+            'side': lambda _: room1.set_side(Direction.NORTH, wall),
+        }
+        costs = {role: ProductCost(names[role], *_measure(make, samples)) for role, make in makers.items()}
+        costs['wall'].shared = factory.make_wall() is factory.make_wall()
+        return costs
+
+
+class EstimatingMazeBuilder(CountingMazeBuilder):
+    """
+    Строитель "вхолостую": по сценарию постройки считает комнаты и двери и по калиброванным стоимостям продуктов
+    целевой фабрики предсказывает число объектов, память и время постройки. Сам ничего не создает, поэтому слишком
+    большой лабиринт можно отклонить или разбить на части (generating/parallel.py) до выделения памяти.
+    Стены считаются так же, как строит generating/generator.py: 4 на комнату, минус 2 на каждую дверь. Если фабрика
+    отдает одну общую стену (ProductCost.shared), объект стены один, а время считается на каждый вызов make_wall.
+    Во время постройки учитываются и 4 установки сторон на комнату
+    """
+    def __init__(self, factory=None, costs: Optional[Dict[str, ProductCost]] = None):
+        """
+        :param factory: целевая фабрика. Калибруется при первом прогнозе, если не переданы costs
+        :param costs: готовые стоимости продуктов (результат calibrate)
+        """
+        if factory is None and costs is None:
+            raise ValueError('Нужна целевая фабрика или стоимости ее продуктов')
+        super().__init__()
+        self.__factory = factory
+        self.__costs = costs
+
+    @property
+    def costs(self) -> Dict[str, ProductCost]:
+        if self.__costs is None:
+            self.__costs = calibrate(self.__factory)
+        return self.__costs
+
+    def get_estimate(self) -> Estimate:
+        rooms, doors = self.get_counts()
+        roles = {'room': rooms, 'wall': max(4 * rooms - 2 * doors, 0), 'door': doors}
+        counts = Counter()
+        size = seconds = 0.0
+        for role, calls in roles.items():
+            cost = self.costs[role]
+            count = min(calls, 1) if cost.shared else calls
+            counts[cost.name] += count
+            size += count * cost.bytes
+            seconds += calls * cost.seconds
+        seconds += 4 * rooms * self.costs['side'].seconds
+        return Estimate(dict(counts), int(size), seconds)
+
+    def get_maze(self) -> None:
+        estimate = self.get_estimate()
+        objects = ', '.join(f'{name}: {count}' for name, count in estimate.counts.items())
+        print(f'Прогноз: {objects}; {estimate.bytes / 2 ** 20:.1f} МБ, {estimate.seconds:.2f} с')
+        return None
+
+
+class FileMazeBuilder(MazeBuilder):
+    """
+    Строитель, который не держит лабиринт в памяти, а записывает команды постройки в текстовый файл.
+    Файл читается обратно функцией generating.streaming.read_chunks
+    """
+    def __init__(self, file: TextIO):
+        self.__file = file
+
+    def build_maze(self):
+        self.__file.write('maze\n')
+
+    def build_room(self, room_no: int):
+        self.__file.write(f'room {room_no}\n')
+
+    def build_door(self, room1: int, room2: int):
+        self.__file.write(f'door {room1} {room2}\n')
+
+    def get_maze(self) -> None:
+        self.__file.flush()
+        return None
+
+
 def create_maze(builder: MazeBuilder) -> Maze:
     print('Builder: {}'.format(type(builder)))
     builder.build_maze()
@@ -112,5 +433,10 @@ def create_maze(builder: MazeBuilder) -> Maze:
     return maze
 
 
-create_maze(StandardMazeBuilder())
-create_maze(CountingMazeBuilder())
+if __name__ == '__main__':
+    create_maze(StandardMazeBuilder())
+    create_maze(CountingMazeBuilder())
+
+    from generating.abstract_factory import MazeFactory
+    create_maze(EstimatingMazeBuilder(MazeFactory()))
+    create_maze(EstimatingMazeBuilder(MazeFactory(pooled=True)))
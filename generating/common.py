@@ -15,11 +15,14 @@
 __author__ = 'Мауталиев С. И.'
 
 
+import copy
+import pickle
 from abc import ABCMeta, abstractmethod
 from enum import IntEnum
-from typing import NoReturn, Optional
+from typing import Iterable, List, NoReturn, Optional, Tuple
 
-from helpers import except_error, print_obj_type
+from generating.connectivity import DisjointSet
+from helpers import except_error, creation_events
 
 
 class Direction(IntEnum):
@@ -29,40 +32,70 @@ class Direction(IntEnum):
     WEST = 4
 
     @classmethod
-    def get_navigation(cls) -> dict:
-        return {way: None for way in cls}
+    def get_navigation(cls) -> list:
+        """Пустая навигация комнаты: по ячейке на каждое направление, индекс ячейки - значение направления минус 1"""
+        return [None] * NAVIGATION_SIZE
+
+
+# len(Direction) у перечислений медленный, а навигация создается для каждой комнаты
+NAVIGATION_SIZE = len(Direction)
 
 
 class MapSite(object):
     """Часть лабиринта. Абстрактный"""
     __metaclass__ = ABCMeta
+    # У частей лабиринта фиксированный набор полей, поэтому словари экземпляров им не нужны
+    __slots__ = ()
+    # Двери соединяют комнаты, по ним строятся пути и связность лабиринта
+    is_door = False
 
     @abstractmethod
     def enter(self):
         """Войти"""
 
+    def get_state(self) -> int:
+        """Собственное состояние части лабиринта, упакованное в целое число (нужно для сохранения на диск)"""
+        return 0
+
+    def set_state(self, state: int):
+        """Восстановить собственное состояние из числа, полученного get_state"""
+
 
 class Room(MapSite):
     """Комната"""
+    __slots__ = ('__navigation', 'room_no', '_maze')
+
     def __init__(self, no: int):
         self.__navigation = Direction.get_navigation()
         self.room_no = no
-        print_obj_type(self)
+        # Лабиринт, в который добавлена комната. Ему сообщается об изменении дверей
+        self._maze = None
+        if creation_events.enabled:
+            creation_events.emit(self)
 
     def enter(self):
         pass
 
     def get_side(self, direction: Direction) -> MapSite:
-        return self.__navigation.get(direction)
+        return self.__navigation[direction - 1]
 
     def set_side(self, direction: Direction, obj: MapSite):
-        self.__navigation[direction] = obj
+        maze = self._maze
+        if maze is not None and maze._copy_on_write:
+            maze.check_owned(self)
+        old = self.__navigation[direction - 1]
+        self.__navigation[direction - 1] = obj
+        if maze is not None and (obj is not None and obj.is_door or old is not None and old.is_door):
+            maze.door_changed(self, old, obj)
 
 
 class Wall(MapSite):
     """Стена"""
+    __slots__ = ()
+
     def __init__(self):
-        print_obj_type(self)
+        if creation_events.enabled:
+            creation_events.emit(self)
 
     def enter(self):
         pass
@@ -70,28 +103,196 @@ class Wall(MapSite):
 
 class Door(MapSite):
     """Дверь"""
+    __slots__ = ('__room1', '__room2', '__is_open')
+    is_door = True
 
     def __init__(self, room1: Room, room2: Room):
         self.__room1 = room1
         self.__room2 = room2
         self.__is_open = False
-        print_obj_type(self)
+        if creation_events.enabled:
+            creation_events.emit(self)
 
     def enter(self, **kwargs):
         print('Дверь открыта!')
 
+    def get_rooms(self) -> Tuple[Room, Room]:
+        """Комнаты, которые соединяет дверь"""
+        return self.__room1, self.__room2
+
+    def other_side_from(self, room: Room) -> Optional[Room]:
+        """Комната по другую сторону двери"""
+        if room is self.__room1:
+            return self.__room2
+        if room is self.__room2:
+            return self.__room1
+        return None
+
 
 class Maze:
     """Лабиринт"""
     def __init__(self):
-        self.__rooms = []
+        # Индекс комнат по номеру - поиск, вставка и удаление за O(1). Подклассы могут подменить словарь другим
+        # отображением номер -> комната (например, общим слоем клонов в generating/prototype.py)
+        self._rooms = {}
+        # Счетчик изменений связей между комнатами. По нему движок путей понимает, что его кэш устарел
+        self.topology_version = 0
+        self.__paths = None
+        # Индекс связности строится при первом запросе и дальше дополняется по мере появления дверей.
+        # Если дверь пропала, индекс сбрасывается и будет перестроен при следующем запросе
+        self.__components: Optional[DisjointSet] = None
+        # Лабиринт делит комнаты с клонами (generating/prototype.py): комнату можно менять, только получив свою копию
+        self._copy_on_write = False
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, n: int) -> bool:
+        return n in self._rooms
 
     def add_room(self, room: Room) -> NoReturn:
-        self.__rooms.append(room)
+        if room.room_no in self._rooms:
+            raise ValueError(f'Комната с номером {room.room_no} уже есть в лабиринте')
+        self._rooms[room.room_no] = room
+        room._maze = self
+        self.topology_version += 1
+        if self.__components is not None:
+            self.__components.add(room.room_no)
+            self.__connect_doors(room)
+
+    def add_rooms(self, rooms: Iterable[Room]) -> NoReturn:
+        """Добавить комнаты пачкой. Если хоть один номер повторяется, лабиринт не меняется"""
+        batch = {}
+        for room in rooms:
+            if room.room_no in self._rooms or room.room_no in batch:
+                raise ValueError(f'Комната с номером {room.room_no} уже есть в лабиринте')
+            batch[room.room_no] = room
+        self._rooms.update(batch)
+        for room in batch.values():
+            room._maze = self
+        self.topology_version += 1
+        if self.__components is not None:
+            for room_no in batch:
+                self.__components.add(room_no)
+            for room in batch.values():
+                self.__connect_doors(room)
+
+    def remove_room(self, n: int) -> Room:
+        """Удалить комнату из лабиринта"""
+        try:
+            room = self._rooms.pop(n)
+        except KeyError:
+            raise ValueError(f'Не существует комнаты с номером {n}') from None
+        # Комната может принадлежать другому лабиринту, с которым этот делит комнаты
+        if room._maze is self:
+            room._maze = None
+        self.topology_version += 1
+        self.__components = None
+        return room
 
     @except_error()
     def get_room(self, n: int) -> Optional[Room]:
-        for room in self.__rooms:
-            if room.room_no == n:
-                return room
-        return None
+        return self._rooms.get(n)
+
+    def own_room(self, n: int) -> Room:
+        """
+        Комната, которую можно менять. У обычного лабиринта это сама комната, а лабиринт, который делит комнаты
+        с клонами, сначала копирует ее себе
+        """
+        room = self.get_room(n)
+        if room is None:
+            raise ValueError(f'Не существует комнаты с номером {n}')
+        return room
+
+    def check_owned(self, room: Room) -> NoReturn:
+        """Проверить, что комнату можно менять (см. own_room). У обычного лабиринта можно менять любую"""
+
+    def set_side(self, n: int, direction: Direction, obj: MapSite) -> NoReturn:
+        """Поставить сторону комнаты с номером n. В отличие от Room.set_side работает и для общих с клонами комнат"""
+        self.own_room(n).set_side(direction, obj)
+
+    def get_rooms(self, numbers: Optional[Iterable[int]] = None) -> List[Optional[Room]]:
+        """
+        Получить комнаты пачкой
+        :param numbers: номера комнат, если не указаны - возвращаются все комнаты лабиринта
+        :return: комнаты в порядке номеров, для несуществующих номеров - None
+        """
+        if numbers is None:
+            return list(self._rooms.values())
+        get = self._rooms.get
+        return [get(n) for n in numbers]
+
+    def door_changed(self, room: Room, old: Optional[MapSite], new: Optional[MapSite]) -> NoReturn:
+        """Комната лабиринта сообщает, что у нее появилась или пропала дверь"""
+        self.topology_version += 1
+        if self.__components is None:
+            return
+        if old is not None and old.is_door:
+            self.__components = None
+        elif new is not None and new.is_door:
+            self.__connect_door(room, new)
+
+    def __connect_door(self, room: Room, door: MapSite):
+        other = door.other_side_from(room)
+        if other is not None and other.room_no in self._rooms:
+            self.__components.union(room.room_no, other.room_no)
+
+    def __connect_doors(self, room: Room):
+        for direction in Direction:
+            side = room.get_side(direction)
+            if side is not None and side.is_door:
+                self.__connect_door(room, side)
+
+    def __get_components(self) -> DisjointSet:
+        if self.__components is None:
+            self.__components = DisjointSet(self._rooms)
+            for room in self._rooms.values():
+                self.__connect_doors(room)
+        return self.__components
+
+    def is_connected(self, n1: int, n2: int) -> bool:
+        """Связаны ли комнаты дверьми (напрямую или через другие комнаты)"""
+        for n in (n1, n2):
+            if n not in self._rooms:
+                raise ValueError(f'Не существует комнаты с номером {n}')
+        return self.__get_components().connected(n1, n2)
+
+    def components_count(self) -> int:
+        """Количество компонент связности лабиринта"""
+        return self.__get_components().count
+
+    @property
+    def paths(self):
+        """Движок поиска путей по дверям лабиринта. Создается при первом обращении"""
+        if self.__paths is None:
+            from generating.paths import MazePaths
+            self.__paths = MazePaths(self)
+        return self.__paths
+
+    def __reduce_ex__(self, protocol):
+        """
+        Лабиринт сериализуется не графом объектов (комнаты ссылаются на двери, двери на комнаты - глубокая рекурсия),
+        а плоскими таблицами generating/storage.py в одном буфере. С протокола 5 буфер передается как PickleBuffer,
+        то есть может уйти вне основного потока (out-of-band) без копирования
+        """
+        from generating.storage import flatten, restore_maze, tables_to_bytes
+        try:
+            data = tables_to_bytes(flatten(self))
+        except ValueError:
+            # В лабиринте есть продукт незарегистрированного класса (register_product), его нельзя разложить
+            # в таблицы, поэтому лабиринт сериализуется обычным способом - графом объектов
+            return super().__reduce_ex__(protocol)
+        return restore_maze, (type(self), pickle.PickleBuffer(data) if protocol >= 5 else data)
+
+    def __copy__(self):
+        """
+        Поверхностная копия: __reduce_ex__ раскладывает лабиринт в таблицы, и без этого метода copy.copy собирал бы
+        лабиринт из новых комнат. Копия делит комнаты с оригиналом, а индекс комнат и кэши путей и связности у нее
+        свои. Об изменении дверей общая комната сообщает лабиринту, в который была добавлена, то есть оригиналу
+        """
+        maze = type(self).__new__(type(self))
+        maze.__dict__.update(self.__dict__)
+        maze._rooms = copy.copy(self._rooms)
+        maze.__paths = None
+        maze.__components = None
+        return maze
@@ -0,0 +1,70 @@
+"""
+Система непересекающихся множеств (union-find)
+
+Нужна лабиринту, чтобы за почти константное время отвечать, связаны ли две комнаты дверьми и сколько в нем
+компонент связности. Используется сжатие путей и объединение по рангу
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+from typing import Dict, Hashable, Iterable
+
+
+class DisjointSet:
+    """Система непересекающихся множеств"""
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.__parent: Dict[Hashable, Hashable] = {}
+        self.__rank: Dict[Hashable, int] = {}
+        self.__count = 0
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self.__parent)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.__parent
+
+    @property
+    def count(self) -> int:
+        """Количество множеств"""
+        return self.__count
+
+    def add(self, item: Hashable):
+        """Добавить элемент отдельным множеством"""
+        if item in self.__parent:
+            return
+        self.__parent[item] = item
+        self.__rank[item] = 0
+        self.__count += 1
+
+    def find(self, item: Hashable) -> Hashable:
+        """Найти представителя множества элемента"""
+        parent = self.__parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        # Сжатие путей: все элементы по пути теперь ссылаются прямо на корень
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, item1: Hashable, item2: Hashable) -> bool:
+        """
+        Объединить множества двух элементов
+        :return: True, если элементы были в разных множествах
+        """
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 == root2:
+            return False
+        rank = self.__rank
+        if rank[root1] < rank[root2]:
+            root1, root2 = root2, root1
+        self.__parent[root2] = root1
+        if rank[root1] == rank[root2]:
+            rank[root1] += 1
+        self.__count -= 1
+        return True
+
+    def connected(self, item1: Hashable, item2: Hashable) -> bool:
+        return self.find(item1) == self.find(item2)
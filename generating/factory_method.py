@@ -7,14 +7,184 @@
 
 __author__ = 'Мауталиев С. И.'
 
-from abstract_factory import create_maze, BombedWall, RoomWithBomb, EnchantedRoom, EnchantedDoor
-from common import Maze, Room, Wall, Door
+from collections import Counter
+from typing import Callable, List, Optional
+
+from generating.abstract_factory import create_maze, BombedWall, RoomWithBomb, EnchantedRoom, EnchantedDoor
+from generating.common import Maze, Room, Wall, Door, Direction
+
+
+# Коды инструкций плана постройки. Аргументы - номера ячеек, в которых при воспроизведении лежат созданные объекты.
+# Коды MAKE_* совпадают с индексами фабричных методов в шагах скомпилированного плана
+MAKE_MAZE, MAKE_ROOM, MAKE_WALL, MAKE_DOOR, ADD_ROOM, SET_SIDE = range(6)
+
+
+class _Recorded:
+    """Заглушка продукта при записи плана: запоминает, какие методы у нее вызывали"""
+    def __init__(self, plan: 'ConstructionPlan', slot: int):
+        self.slot = slot
+        self.__plan = plan
+
+    def add_room(self, room: '_Recorded'):
+        self.__plan.emit(ADD_ROOM, self.slot, room.slot)
+
+    def set_side(self, direction: Direction, obj: '_Recorded'):
+        self.__plan.emit(SET_SIDE, self.slot, direction, obj.slot)
+
+
+# Шаги скомпилированного плана. Шаг получает ячейки и кортеж фабричных методов, индекс в котором - код инструкции
+# MAKE_*. Аргументы инструкции уже разрешены в номера ячеек и константы, поэтому при воспроизведении коды не проверяются
+
+def _make_step(target: int, code: int) -> Callable:
+    def step(slots: list, makers: tuple):
+        slots[target] = makers[code]()
+    return step
+
+
+def _make_room_step(target: int, no) -> Callable:
+    def step(slots: list, makers: tuple):
+        slots[target] = makers[MAKE_ROOM](no)
+    return step
+
+
+def _make_door_step(target: int, room1: int, room2: int) -> Callable:
+    def step(slots: list, makers: tuple):
+        slots[target] = makers[MAKE_DOOR](slots[room1], slots[room2])
+    return step
+
+
+def _add_room_step(target: int, room: int) -> Callable:
+    def step(slots: list, makers: tuple):
+        slots[target].add_room(slots[room])
+    return step
+
+
+def _set_side_step(target: int, direction: Direction, obj: int) -> Callable:
+    def step(slots: list, makers: tuple):
+        slots[target].set_side(direction, slots[obj])
+    return step
+
+
+def _set_new_wall_step(target: int, direction: Direction) -> Callable:
+    """make_wall и сразу set_side с этой стеной, как в create_maze: стена не хранится в ячейке"""
+    def step(slots: list, makers: tuple):
+        slots[target].set_side(direction, makers[MAKE_WALL]())
+    return step
+
+
+class ConstructionPlan:
+    """
+    Записанный план постройки лабиринта.
+    Сценарий (например, create_maze) один раз выполняется с записывающей фабрикой: вызовы make_* и set_side/add_room
+    превращаются в плоский список инструкций. При первом воспроизведении список компилируется в список шагов -
+    функций с уже разрешенными ячейками и аргументами, после чего воспроизведение просто вызывает шаги по порядку
+    с фабричными методами любой MazeGame, без повторного выполнения сценария, его проверок и вывода
+    """
+    def __init__(self):
+        self.__instructions: List[tuple] = []
+        self.__slots = 0
+        self.__result = None
+        self.__steps: Optional[List[Callable]] = None
+
+    @classmethod
+    def record(cls, script: Callable = create_maze) -> 'ConstructionPlan':
+        """Записать план сценария script(фабрика) -> лабиринт"""
+        plan = cls()
+        result = script(_PlanRecorder(plan))
+        if not isinstance(result, _Recorded):
+            raise ValueError('Сценарий должен вернуть лабиринт, созданный через make_maze')
+        plan.__result = result.slot
+        return plan
+
+    def emit(self, *instruction):
+        self.__instructions.append(instruction)
+        self.__steps = None
+
+    def new_slot(self) -> int:
+        self.__slots += 1
+        return self.__slots - 1
+
+    def __len__(self) -> int:
+        return len(self.__instructions)
+
+    def __compile(self) -> List[Callable]:
+        instructions = self.__instructions
+        # Сколько раз ячейка используется как аргумент: стену, которую сразу ставит следующий set_side и больше
+        # никто не использует, можно не хранить в ячейке
+        uses = Counter()
+        for code, slot, *args in instructions:
+            if code == SET_SIDE:
+                uses[args[1]] += 1
+            elif code == ADD_ROOM:
+                uses[args[0]] += 1
+            elif code == MAKE_DOOR:
+                uses.update(args)
+        uses[self.__result] += 1
+        steps = []
+        position = 0
+        while position < len(instructions):
+            code, slot, *args = instructions[position]
+            following = instructions[position + 1] if position + 1 < len(instructions) else None
+            if (code == MAKE_WALL and uses[slot] == 1 and following is not None and following[0] == SET_SIDE
+                    and following[3] == slot):
+                steps.append(_set_new_wall_step(following[1], Direction(following[2])))
+                position += 2
+                continue
+            if code == SET_SIDE:
+                steps.append(_set_side_step(slot, Direction(args[0]), args[1]))
+            elif code == ADD_ROOM:
+                steps.append(_add_room_step(slot, args[0]))
+            elif code == MAKE_ROOM:
+                steps.append(_make_room_step(slot, args[0]))
+            elif code == MAKE_DOOR:
+                steps.append(_make_door_step(slot, args[0], args[1]))
+            else:
+                steps.append(_make_step(slot, code))
+            position += 1
+        return steps
+
+    def replay(self, game: 'MazeGame') -> Maze:
+        """Построить лабиринт по плану фабричными методами game"""
+        steps = self.__steps
+        if steps is None:
+            steps = self.__steps = self.__compile()
+        # Фабричные методы связываются один раз на воспроизведение, ячейки - список созданных объектов
+        makers = (game.make_maze, game.make_room, game.make_wall, game.make_door)
+        slots = [None] * self.__slots
+        for step in steps:
+            step(slots, makers)
+        return slots[self.__result]
+
+
+class _PlanRecorder:
+    """Записывающая фабрика: вместо продуктов выдает заглушки и пишет инструкции в план"""
+    def __init__(self, plan: ConstructionPlan):
+        self.__plan = plan
+
+    def __make(self, code: int, *args) -> _Recorded:
+        product = _Recorded(self.__plan, self.__plan.new_slot())
+        self.__plan.emit(code, product.slot, *args)
+        return product
+
+    def make_maze(self) -> _Recorded:
+        return self.__make(MAKE_MAZE)
+
+    def make_room(self, no: int) -> _Recorded:
+        return self.__make(MAKE_ROOM, no)
+
+    def make_wall(self) -> _Recorded:
+        return self.__make(MAKE_WALL)
+
+    def make_door(self, room1: _Recorded, room2: _Recorded) -> _Recorded:
+        return self.__make(MAKE_DOOR, room1.slot, room2.slot)
 
 
 # Фабричный метод - это метод create_maze. То есть метод, который меняет свое поведение в зависимости от того, в какой
 # фабрике выполняется.
 class MazeGame:
     """Фабрика. Создает продукт - лабиринт. В конкретном случае является и абстрактной, и конкретной"""
+    __default_plan = None
+
     def create_maze(self) -> Maze:
         """Создадим лабиринт. Этот метод называется фабричным"""
         # Так как паттерн в целом похож на абстрактную фабрику
@@ -22,6 +192,17 @@ class MazeGame:
         # Благо интерфейсы совпадают
         return create_maze(self)
 
+    def create_mazes(self, count: int, plan: ConstructionPlan = None) -> List[Maze]:
+        """
+        Создать count одинаковых по форме лабиринтов воспроизведением плана.
+        По умолчанию план create_maze записывается один раз на все подклассы MazeGame
+        """
+        if plan is None:
+            if MazeGame.__default_plan is None:
+                MazeGame.__default_plan = ConstructionPlan.record()
+            plan = MazeGame.__default_plan
+        return [plan.replay(self) for _ in range(count)]
+
     def make_maze(self) -> Maze:
         return Maze()
 
@@ -56,6 +237,7 @@ class EnchantedMazeGame(MazeGame):
         return EnchantedDoor(room1, room2)
 
 
-MazeGame().create_maze()
-BombedMazeGame().create_maze()
-EnchantedMazeGame().create_maze()
+if __name__ == '__main__':
+    MazeGame().create_maze()
+    BombedMazeGame().create_maze()
+    EnchantedMazeGame().create_maze()
@@ -0,0 +1,256 @@
+"""
+Компактное (колоночное) хранение лабиринта
+
+В обычном Maze каждая комната - отдельный объект со своей навигацией, а каждая стена - еще один объект в куче, поэтому
+на одну комнату уходят сотни байт. MazeGrid хранит номера комнат, стороны и концы дверей в типизированных массивах
+(модуль array), а комнаты, стены и двери здесь - легковесные представления поверх этих массивов, которые создаются по
+требованию. Представления реализуют тот же интерфейс get_side/set_side/enter, поэтому create_maze из
+abstract_factory.py работает с MazeGridFactory без изменений
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+from array import array
+from typing import Iterable, List, NoReturn, Optional
+
+from generating.abstract_factory import MazeFactory
+from generating.common import MapSite, Direction
+
+
+# Кодирование стороны комнаты в массиве сторон:
+#  0 - сторона не задана
+#  > 0 - дверь сетки с индексом (значение - 1)
+#  < 0 - объект из таблицы объектов с индексом (-значение - 1). Все обычные стены сетки - один и тот же объект
+EMPTY_SIDE = 0
+
+
+class GridWall(MapSite):
+    """Стена сетки. Состояния не имеет, поэтому на всю сетку она одна"""
+    __slots__ = ()
+
+    def enter(self):
+        pass
+
+
+class GridRoom(MapSite):
+    """Представление комнаты, хранящейся в MazeGrid"""
+    __slots__ = ('__grid', '__index')
+
+    def __init__(self, grid: 'MazeGrid', index: int):
+        self.__grid = grid
+        self.__index = index
+
+    def __eq__(self, other):
+        return isinstance(other, GridRoom) and self.__grid is other.__grid and self.__index == other.__index
+
+    def __hash__(self):
+        return hash((id(self.__grid), self.__index))
+
+    def __repr__(self):
+        return f'GridRoom({self.room_no})'
+
+    @property
+    def grid(self) -> 'MazeGrid':
+        return self.__grid
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def room_no(self) -> int:
+        return self.__grid.room_number(self.__index)
+
+    def enter(self):
+        pass
+
+    def get_side(self, direction: Direction) -> Optional[MapSite]:
+        return self.__grid.get_side(self.__index, direction)
+
+    def set_side(self, direction: Direction, obj: MapSite):
+        self.__grid.set_side(self.__index, direction, obj)
+
+
+class GridDoor(MapSite):
+    """Представление двери, хранящейся в MazeGrid"""
+    __slots__ = ('__grid', '__index')
+    is_door = True
+
+    def __init__(self, grid: 'MazeGrid', index: int):
+        self.__grid = grid
+        self.__index = index
+
+    def __eq__(self, other):
+        return isinstance(other, GridDoor) and self.__grid is other.__grid and self.__index == other.__index
+
+    def __hash__(self):
+        return hash((id(self.__grid), self.__index))
+
+    @property
+    def grid(self) -> 'MazeGrid':
+        return self.__grid
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    def get_rooms(self) -> (GridRoom, GridRoom):
+        """Комнаты, которые соединяет дверь"""
+        return self.__grid.door_rooms(self.__index)
+
+    def other_side_from(self, room: GridRoom) -> Optional[GridRoom]:
+        """Комната по другую сторону двери"""
+        room1, room2 = self.get_rooms()
+        if room == room1:
+            return room2
+        if room == room2:
+            return room1
+        return None
+
+    def enter(self, **kwargs):
+        print('Дверь открыта!')
+
+
+class MazeGrid:
+    """
+    Лабиринт, хранящий комнаты в массивах.
+    Комнаты хранятся по индексам в порядке добавления. Если номера комнат идут подряд (как в сгенерированных
+    лабиринтах), то словарь номер -> индекс не заполняется вовсе, и на комнату уходит около 40 байт
+    """
+    def __init__(self):
+        self.__numbers = array('q')
+        self.__sides = array('q')
+        self.__door_rooms = array('q')
+        # Номера комнат, которые не укладываются в сплошной диапазон, начинающийся с первой комнаты
+        self.__sparse = {}
+        # Таблица прочих объектов сторон (чужие стены и двери). Нулевой объект - общая стена сетки
+        self.wall = GridWall()
+        self.__objects = [self.wall]
+        self.__object_index = {id(self.wall): 0}
+
+    def __len__(self) -> int:
+        return len(self.__numbers)
+
+    def __contains__(self, n: int) -> bool:
+        return self.__find(n) is not None
+
+    def __find(self, n: int) -> Optional[int]:
+        numbers = self.__numbers
+        if numbers:
+            index = n - numbers[0]
+            if 0 <= index < len(numbers) and numbers[index] == n:
+                return index
+        return self.__sparse.get(n)
+
+    def __encode(self, obj: Optional[MapSite]) -> int:
+        if obj is None:
+            return EMPTY_SIDE
+        if isinstance(obj, GridDoor) and obj.grid is self:
+            return obj.index + 1
+        key = id(obj)
+        slot = self.__object_index.get(key)
+        if slot is None:
+            slot = len(self.__objects)
+            self.__objects.append(obj)
+            self.__object_index[key] = slot
+        return -slot - 1
+
+    def new_room(self, no: int) -> GridRoom:
+        """Завести комнату в сетке и вернуть ее представление"""
+        if self.__find(no) is not None:
+            raise ValueError(f'Комната с номером {no} уже есть в лабиринте')
+        index = len(self.__numbers)
+        if index and no != self.__numbers[0] + index:
+            self.__sparse[no] = index
+        self.__numbers.append(no)
+        self.__sides.extend((EMPTY_SIDE, EMPTY_SIDE, EMPTY_SIDE, EMPTY_SIDE))
+        return GridRoom(self, index)
+
+    def new_door(self, room1: GridRoom, room2: GridRoom) -> GridDoor:
+        """Завести дверь между двумя комнатами сетки"""
+        for room in (room1, room2):
+            if not isinstance(room, GridRoom) or room.grid is not self:
+                raise ValueError(f'Комната {room} не принадлежит этой сетке')
+        index = len(self.__door_rooms) // 2
+        self.__door_rooms.extend((room1.index, room2.index))
+        return GridDoor(self, index)
+
+    def room_number(self, index: int) -> int:
+        return self.__numbers[index]
+
+    def door_rooms(self, index: int) -> (GridRoom, GridRoom):
+        return GridRoom(self, self.__door_rooms[2 * index]), GridRoom(self, self.__door_rooms[2 * index + 1])
+
+    def doors_count(self) -> int:
+        return len(self.__door_rooms) // 2
+
+    def get_side(self, index: int, direction: Direction) -> Optional[MapSite]:
+        value = self.__sides[4 * index + direction - 1]
+        if value > 0:
+            return GridDoor(self, value - 1)
+        if value < 0:
+            return self.__objects[-value - 1]
+        return None
+
+    def set_side(self, index: int, direction: Direction, obj: Optional[MapSite]):
+        self.__sides[4 * index + direction - 1] = self.__encode(obj)
+
+    def add_room(self, room: MapSite) -> NoReturn:
+        """
+        Добавить комнату в лабиринт.
+        Представления этой сетки уже в ней лежат, а обычные комнаты копируются в массивы вместе с уже заданными
+        сторонами (стороны, заданные после добавления, в сетку не попадут)
+        """
+        if isinstance(room, GridRoom) and room.grid is self:
+            return
+        view = self.new_room(room.room_no)
+        for direction in Direction:
+            view.set_side(direction, room.get_side(direction))
+
+    def add_rooms(self, rooms: Iterable[MapSite]) -> NoReturn:
+        for room in rooms:
+            self.add_room(room)
+
+    def get_room(self, n: int) -> Optional[GridRoom]:
+        index = self.__find(n)
+        return None if index is None else GridRoom(self, index)
+
+    def get_rooms(self, numbers: Optional[Iterable[int]] = None) -> List[Optional[GridRoom]]:
+        if numbers is None:
+            return [GridRoom(self, index) for index in range(len(self.__numbers))]
+        return [self.get_room(n) for n in numbers]
+
+    def nbytes(self) -> int:
+        """Сколько байт занимают массивы сетки (без таблицы прочих объектов и словаря разреженных номеров)"""
+        return sum(a.itemsize * len(a) for a in (self.__numbers, self.__sides, self.__door_rooms))
+
+
+class MazeGridFactory(MazeFactory):
+    """
+    Фабрика компактного лабиринта. Продукты - представления над массивами последней созданной сетки,
+    поэтому make_maze нужно вызвать до остальных make_*
+    """
+    def __init__(self):
+        super().__init__()
+        self.__grid: Optional[MazeGrid] = None
+
+    def make_maze(self) -> MazeGrid:
+        self.__grid = MazeGrid()
+        return self.__grid
+
+    def make_wall(self) -> GridWall:
+        return self.__grid.wall
+
+    def make_room(self, room_no: int) -> GridRoom:
+        return self.__grid.new_room(room_no)
+
+    def make_door(self, room1: GridRoom, room2: GridRoom) -> GridDoor:
+        return self.__grid.new_door(room1, room2)
+
+
+if __name__ == '__main__':
+    from generating.abstract_factory import create_maze
+
+    grid = create_maze(MazeGridFactory())
+    room1, room2 = grid.get_rooms([1, 2])
+    print(room1.get_side(Direction.EAST).get_rooms(), f'{grid.nbytes()} байт на {len(grid)} комнаты')
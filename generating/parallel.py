@@ -0,0 +1,153 @@
+"""
+Параллельная генерация больших лабиринтов
+
+Сетка W x H делится на горизонтальные полосы по числу процессов. Каждая полоса строится в отдельном процессе
+ProcessPoolExecutor через выбранную фабрику (generating/generator.py) и возвращается в виде плоских таблиц
+generating/storage.py: передать между процессами сами объекты комнат нельзя, а таблицы передаются одним куском байт.
+В родительском процессе таблицы склеиваются, а соседние полосы сшиваются дверью, которую делает та же фабрика.
+Каждая полоса - остовное дерево, поэтому одна дверь на границу дает остовное дерево всей сетки.
+
+Зерна полос и места дверей на границах берутся из RandomStream(seed), поэтому при одинаковых зерне и числе процессов
+лабиринт получается одинаковым. Результат - MappedMaze поверх склеенного буфера: комнаты создаются при обращении
+той же фабрикой, что строила полосы, а из таблиц берется только их состояние. Так сохраняется поведение фабрики,
+например общая стена MazeFactory(pooled=True).
+
+Что ускоряется: параллельно идут генерация остовных деревьев полос (generating/generator.py, шаг 1) и разбор полос
+в таблицы. Объекты, созданные в исполнителях, в родительский процесс не передаются, поэтому все комнаты, стены и
+двери родитель создает заново фабрикой - лениво, при обращении к комнатам. Время до полной материализации
+лабиринта (materialize_all) параллельный путь не сокращает, а лишь откладывает; выигрыш - в быстром получении
+готового к чтению лабиринта и в том, что создаются только нужные комнаты
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import copy
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from generating.common import Direction
+from generating.generator import generate_maze
+from generating.randomness import RandomStream
+from generating.storage import (
+    NO_REF, PRODUCT_TYPES, ROOM_RECORD, SIDE_RECORD, MappedMaze, MazeTables, flatten, product_name, tables_to_bytes,
+)
+from helpers import NullSink, creation_events
+
+
+# Запись комнаты как массив int32: номер (2 числа), тип, состояние, 4 стороны. Запись стороны: тип, состояние, 2 комнаты
+ROOM_INTS = ROOM_RECORD.size // 4
+SIDE_INTS = SIDE_RECORD.size // 4
+
+
+def _build_region(task: tuple) -> MazeTables:
+    """Построить полосу лабиринта в процессе-исполнителе. Вывод событий создания в исполнителях отключен"""
+    factory, width, rows, algorithm, seed, factory_seed, first_room, types = task
+    # Все исполнители получают копию фабрики с одним и тем же состоянием потока случайных чисел, поэтому фабрика с
+    # потоком (EnchantedMazeFactory, BombedMazeFactory) получает свое зерно в каждой полосе
+    reseed = getattr(factory, 'reseed', None)
+    if reseed is not None:
+        reseed(factory_seed)
+    with creation_events.use(NullSink()):
+        maze = generate_maze(factory, width, rows, algorithm, seed, first_room)
+        return flatten(maze, types)
+
+
+def _ints(data: bytes) -> array:
+    result = array('i')
+    result.frombytes(data)
+    if sys.byteorder == 'big':
+        result.byteswap()
+    return result
+
+
+def _shift(values: array, start: int, step: int, delta: int):
+    """Сдвинуть ссылки на delta, не трогая пустые"""
+    if delta:
+        values[start::step] = array('i', [v if v == NO_REF else v + delta for v in values[start::step]])
+
+
+def _remap(values: array, start: int, step: int, mapping: List[int]):
+    values[start::step] = array('i', [mapping[v] for v in values[start::step]])
+
+
+def _merge(regions: List[MazeTables], types: List[str]) -> (array, array):
+    """Склеить таблицы полос в общие таблицы комнат и сторон"""
+    type_index = {name: index for index, name in enumerate(types)}
+    rooms, sides = array('i'), array('i')
+    for region in regions:
+        region_rooms, region_sides = _ints(region.rooms), _ints(region.sides)
+        mapping = [type_index.setdefault(name, len(type_index)) for name in region.types]
+        if mapping != list(range(len(mapping))):
+            _remap(region_rooms, 2, ROOM_INTS, mapping)
+            _remap(region_sides, 0, SIDE_INTS, mapping)
+        for position in range(4, ROOM_INTS):
+            _shift(region_rooms, position, ROOM_INTS, len(sides) // SIDE_INTS)
+        for position in (2, 3):
+            _shift(region_sides, position, SIDE_INTS, len(rooms) // ROOM_INTS)
+        rooms.extend(region_rooms)
+        sides.extend(region_sides)
+    types[:] = sorted(type_index, key=type_index.get)
+    return rooms, sides
+
+
+def generate_parallel(factory, width: int, height: int, workers: int = 4, algorithm: str = 'backtracker',
+                      seed: Optional[int] = None) -> MappedMaze:
+    """
+    Сгенерировать лабиринт W x H в нескольких процессах
+    :param factory: фабрика продуктов; должна сериализоваться pickle, а ее продукты - быть зарегистрированы в storage.
+    Поток случайных чисел фабрики (reseed) в каждой полосе начинается с зерна, выведенного из seed
+    :param width: ширина
+    :param height: высота
+    :param workers: число процессов и полос. При 1 полоса строится в текущем процессе
+    :param algorithm: алгоритм генерации полос (см. generating/generator.py)
+    :param seed: зерно
+    :return: лабиринт, комнаты которого пронумерованы с 1 так же, как в generate_maze, а создаются копией фабрики
+    factory (сама factory не меняется)
+    """
+    if workers < 1:
+        raise ValueError('Число процессов должно быть положительным')
+    regions_count = min(workers, height)
+    stream = RandomStream(seed)
+    seeds = stream.words(regions_count)
+    factory_seeds = stream.words(regions_count)
+    stitch_seed = stream.next_word()
+    bounds = [height * index // regions_count for index in range(regions_count + 1)]
+    types = list(PRODUCT_TYPES)
+    # Каждая полоса получает свою копию фабрики: reseed не должен менять поток случайных чисел фабрики вызывающего,
+    # даже когда полоса строится в текущем процессе
+    tasks = [
+        (copy.copy(factory), width, bounds[index + 1] - bounds[index], algorithm, seeds[index], factory_seeds[index],
+         1 + bounds[index] * width, types)
+        for index in range(regions_count)
+    ]
+    if regions_count == 1:
+        regions = [_build_region(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=regions_count) as executor:
+            regions = list(executor.map(_build_region, tasks))
+    rooms, sides = _merge(regions, types)
+
+    # Сшиваем соседние полосы: дверь делает копия фабрики со своим зерном, а в таблицы попадают ее тип и состояние.
+    # Та же копия потом создает продукты при обращении к комнатам, поэтому фабрика вызывающего не используется вовсе
+    stitcher = copy.copy(factory)
+    reseed = getattr(stitcher, 'reseed', None)
+    if reseed is not None:
+        reseed(stitch_seed)
+    for y in bounds[1:-1]:
+        door = stitcher.make_door(None, None)
+        name = product_name(type(door))
+        if name not in types:
+            types.append(name)
+        upper = (y - 1) * width + stream.below(width)
+        lower = upper + width
+        side = len(sides) // SIDE_INTS
+        sides.extend((types.index(name), door.get_state(), upper, lower))
+        rooms[upper * ROOM_INTS + 4 + Direction.SOUTH - 1] = side
+        rooms[lower * ROOM_INTS + 4 + Direction.NORTH - 1] = side
+
+    if sys.byteorder == 'big':
+        rooms.byteswap()
+        sides.byteswap()
+    return MappedMaze(tables_to_bytes(MazeTables(types, rooms.tobytes(), sides.tobytes())), stitcher)
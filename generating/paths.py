@@ -0,0 +1,195 @@
+"""
+Поиск путей по лабиринту
+
+Комнаты связаны дверьми, поэтому лабиринт - это граф, где вершины - номера комнат, а ребра - двери.
+MazePaths один раз строит списки смежности и кэширует результаты поиска от каждой комнаты-источника. Кэш сбрасывается,
+когда у лабиринта меняется topology_version (добавили/удалили комнату, поставили или убрали дверь через set_side)
+
+Движок доступен через свойство Maze.paths
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import heapq
+from collections import deque
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+from generating.common import Direction, MapSite
+
+
+Coordinates = Union[Mapping[int, Tuple[int, int]], Callable[[int], Tuple[int, int]]]
+DoorCost = Callable[[MapSite], float]
+
+
+class MazePaths:
+    """Движок поиска путей по дверям лабиринта"""
+    def __init__(self, maze):
+        self.__maze = maze
+        self.__version = None
+        self.__adjacency: Dict[int, List[Tuple[int, MapSite]]] = {}
+        # Кэши результатов от комнаты-источника: BFS и Дейкстра со стоимостью по умолчанию. Результаты Дейкстры
+        # с пользовательской стоимостью не кэшируются: каждая новая функция (например, lambda) добавляла бы в кэш
+        # словарь на все комнаты, который жил бы до изменения лабиринта
+        self.__bfs: Dict[int, Tuple[dict, dict]] = {}
+        self.__dijkstra: Dict[int, Tuple[dict, dict]] = {}
+
+    def __refresh(self):
+        if self.__version == self.__maze.topology_version:
+            return
+        adjacency = {}
+        rooms = self.__maze.get_rooms()
+        for room in rooms:
+            adjacency[room.room_no] = []
+        seen = set()
+        for room in rooms:
+            for direction in Direction:
+                side = room.get_side(direction)
+                # Дверь обычно стоит в обеих комнатах, но ребро по ней нужно только одно
+                if side is None or not side.is_door or side in seen:
+                    continue
+                seen.add(side)
+                other = side.other_side_from(room)
+                if other is None or other.room_no not in adjacency:
+                    continue
+                adjacency[room.room_no].append((other.room_no, side))
+                adjacency[other.room_no].append((room.room_no, side))
+        self.__adjacency = adjacency
+        self.__bfs.clear()
+        self.__dijkstra.clear()
+        self.__version = self.__maze.topology_version
+
+    def neighbours(self, room_no: int) -> List[Tuple[int, MapSite]]:
+        """Соседние комнаты и двери, которые к ним ведут"""
+        self.__refresh()
+        return self.__adjacency[room_no]
+
+    def __search(self, source: int) -> Tuple[dict, dict]:
+        self.__refresh()
+        result = self.__bfs.get(source)
+        if result is not None:
+            return result
+        if source not in self.__adjacency:
+            raise ValueError(f'Не существует комнаты с номером {source}')
+        adjacency = self.__adjacency
+        distances, parents = {source: 0}, {source: None}
+        queue = deque((source,))
+        while queue:
+            current = queue.popleft()
+            step = distances[current] + 1
+            for neighbour, _ in adjacency[current]:
+                if neighbour not in distances:
+                    distances[neighbour] = step
+                    parents[neighbour] = current
+                    queue.append(neighbour)
+        self.__bfs[source] = result = distances, parents
+        return result
+
+    def distances(self, source: int) -> Dict[int, int]:
+        """Число дверей от комнаты source до каждой достижимой комнаты"""
+        return self.__search(source)[0]
+
+    def is_reachable(self, source: int, target: int) -> bool:
+        return target in self.__search(source)[0]
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """
+        Кратчайший по числу дверей путь (поиск в ширину)
+        :return: номера комнат от source до target или None, если пути нет
+        """
+        return self.__path(self.__search(source)[1], target)
+
+    def all_pairs(self) -> Dict[int, Dict[int, int]]:
+        """Расстояния между всеми парами комнат. Для N комнат это N поисков в ширину, результаты кэшируются"""
+        self.__refresh()
+        return {source: self.distances(source) for source in self.__adjacency}
+
+    def dijkstra(self, source: int, target: int, cost: Optional[DoorCost] = None) -> Tuple[float, Optional[List[int]]]:
+        """
+        Самый дешевый путь с учетом стоимости прохода через каждую дверь
+        :param cost: функция стоимости двери, по умолчанию каждая дверь стоит 1. Результаты кэшируются только для
+        стоимости по умолчанию, с пользовательской функцией поиск выполняется при каждом вызове
+        :return: стоимость и номера комнат пути, или (inf, None), если пути нет
+        """
+        self.__refresh()
+        if source not in self.__adjacency:
+            raise ValueError(f'Не существует комнаты с номером {source}')
+        if cost is None or cost is _unit_cost:
+            result = self.__dijkstra.get(source)
+            if result is None:
+                result = self.__dijkstra[source] = self.__run_dijkstra(source, _unit_cost)
+        else:
+            result = self.__run_dijkstra(source, cost)
+        costs, parents = result
+        if target not in costs:
+            return float('inf'), None
+        return costs[target], self.__path(parents, target)
+
+    def __run_dijkstra(self, source: int, cost: DoorCost) -> Tuple[dict, dict]:
+        adjacency = self.__adjacency
+        costs, parents = {source: 0}, {source: None}
+        done = set()
+        heap = [(0, source)]
+        while heap:
+            current_cost, current = heapq.heappop(heap)
+            if current in done:
+                continue
+            done.add(current)
+            for neighbour, door in adjacency[current]:
+                new_cost = current_cost + cost(door)
+                if new_cost < costs.get(neighbour, float('inf')):
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = current
+                    heapq.heappush(heap, (new_cost, neighbour))
+        return costs, parents
+
+    def a_star(self, source: int, target: int, coordinates: Coordinates,
+               cost: Optional[DoorCost] = None) -> Tuple[float, Optional[List[int]]]:
+        """
+        Поиск пути A* с манхэттенской эвристикой по координатам комнат на сетке.
+        Эвристика допустима, если проход через дверь между соседними клетками стоит не меньше 1
+        :param coordinates: словарь или функция номер комнаты -> (x, y)
+        :param cost: функция стоимости двери, по умолчанию каждая дверь стоит 1
+        :return: стоимость и номера комнат пути, или (inf, None), если пути нет
+        """
+        self.__refresh()
+        if source not in self.__adjacency:
+            raise ValueError(f'Не существует комнаты с номером {source}')
+        position = coordinates.__getitem__ if isinstance(coordinates, Mapping) else coordinates
+        cost = cost or _unit_cost
+        target_x, target_y = position(target)
+
+        def heuristic(room_no: int) -> int:
+            x, y = position(room_no)
+            return abs(x - target_x) + abs(y - target_y)
+
+        adjacency = self.__adjacency
+        costs, parents = {source: 0}, {source: None}
+        heap = [(heuristic(source), 0, source)]
+        while heap:
+            _, current_cost, current = heapq.heappop(heap)
+            if current == target:
+                return current_cost, self.__path(parents, target)
+            if current_cost > costs[current]:
+                continue
+            for neighbour, door in adjacency[current]:
+                new_cost = current_cost + cost(door)
+                if new_cost < costs.get(neighbour, float('inf')):
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = current
+                    heapq.heappush(heap, (new_cost + heuristic(neighbour), new_cost, neighbour))
+        return float('inf'), None
+
+    @staticmethod
+    def __path(parents: dict, target: int) -> Optional[List[int]]:
+        if target not in parents:
+            return None
+        path = []
+        while target is not None:
+            path.append(target)
+            target = parents[target]
+        path.reverse()
+        return path
+
+
+def _unit_cost(door: MapSite) -> int:
+    return 1
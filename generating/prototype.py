@@ -8,39 +8,188 @@
 __author__ = 'Мауталиев С. И.'
 
 import random
-from copy import deepcopy
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple
 
 # функцию создания лабиринта просто скопируем уже существующую, логика не меняется
-from abstract_factory import create_maze
-from common import MapSite, Maze as MazeBase, Direction, print_obj_type
+from generating.abstract_factory import create_maze
+from generating.common import MapSite, Maze as MazeBase, Direction, creation_events
+from generating.storage import register_product
 
 
 # Здесь нам потребуются новые классы-прототипы для дверей, комнат и т.д...
 
+class RoomLayers(MutableMapping):
+    """
+    Хранилище комнат клона лабиринта: общий с другими клонами слой только для чтения и собственный слой.
+    Новые и скопированные при записи комнаты попадают в собственный слой, удаленные из общего слоя номера
+    запоминаются отдельно, поэтому общий слой никогда не меняется
+    """
+    def __init__(self, shared: Mapping):
+        self.shared = shared
+        self.own: Dict[int, 'Room'] = {}
+        self.__removed = set()
+        self.__size = len(shared)
+
+    def is_clean(self) -> bool:
+        """Нет ни собственных, ни удаленных комнат"""
+        return not self.own and not self.__removed
+
+    def merged(self) -> Dict[int, 'Room']:
+        """
+        Один плоский словарь из общего и собственного слоев с учетом удаленных комнат. Общий слой при этом не
+        меняется, а комнаты не копируются - копируется только индекс номер -> комната
+        """
+        rooms = dict(self.shared)
+        for n in self.__removed:
+            del rooms[n]
+        rooms.update(self.own)
+        return rooms
+
+    def get(self, n: int, default=None):
+        room = self.own.get(n)
+        if room is not None:
+            return room
+        if n in self.__removed:
+            return default
+        return self.shared.get(n, default)
+
+    def __getitem__(self, n: int) -> 'Room':
+        room = self.get(n)
+        if room is None:
+            raise KeyError(n)
+        return room
+
+    def __contains__(self, n) -> bool:
+        return n in self.own or n not in self.__removed and n in self.shared
+
+    def __setitem__(self, n: int, room: 'Room'):
+        if n not in self:
+            self.__size += 1
+        self.own[n] = room
+
+    def __delitem__(self, n: int):
+        if n not in self:
+            raise KeyError(n)
+        self.own.pop(n, None)
+        if n in self.shared:
+            self.__removed.add(n)
+        self.__size -= 1
+
+    def __iter__(self) -> Iterator[int]:
+        own, removed = self.own, self.__removed
+        for n in self.shared:
+            if n not in own and n not in removed:
+                yield n
+        yield from own
+
+    def __len__(self) -> int:
+        return self.__size
+
+
 # Реализуем только логику прототипирования, остальное уже написано в MazeBase
 class Maze(MazeBase):
+    """
+    Клон и исходный лабиринт делят комнаты через общий слой RoomLayers. Клонирование лабиринта, который не менялся
+    с прошлого клонирования, - O(1); иначе его слои один раз сливаются в общий словарь (копируются ссылки, а не
+    комнаты), поэтому поиск комнаты всегда O(1), сколько бы поколений клонов ни было.
+    Общие комнаты только для чтения: Room.set_side на них бросает ValueError. Менять комнату нужно через
+    Maze.set_side или Maze.own_room, тогда лабиринт сначала копирует ее в свой собственный слой.
+    Двери копиями комнат не обновляются, поэтому комнаты за дверью ищутся по номеру (см. Door.other_side_from)
+    """
     def __init__(self, other=None):
         super().__init__()
         if other:
-            self.__rooms = deepcopy(other.__rooms)
+            self._rooms = RoomLayers(other.__share())
+            self._copy_on_write = True
+
+    def __share(self) -> Mapping:
+        """
+        Сделать текущие комнаты общим слоем и вернуть его. Сам лабиринт дальше пишет в собственный слой.
+        Слои не вкладываются друг в друга: если лабиринт менялся после прошлого клонирования, его слои сливаются
+        в один плоский общий слой. Иначе поиск комнаты замедлялся бы с каждым поколением клонов
+        """
+        rooms = self._rooms
+        if isinstance(rooms, RoomLayers):
+            if rooms.is_clean():
+                return rooms.shared
+            rooms = rooms.merged()
+        self._rooms = RoomLayers(rooms)
+        self._copy_on_write = True
+        return rooms
 
     def clone(self):
         return Maze(self)
 
+    def __copy__(self):
+        # Поверхностная копия лабиринта с общими комнатами - это и есть клон
+        return self.clone()
+
+    def own_room(self, n: int) -> 'Room':
+        """Комната, которую можно менять. Общая с другими клонами комната сначала копируется в этот лабиринт"""
+        rooms = self._rooms
+        room = rooms.get(n)
+        if room is None:
+            raise ValueError(f'Не существует комнаты с номером {n}')
+        if isinstance(rooms, RoomLayers) and n not in rooms.own:
+            room = room.clone()
+            room._maze = self
+            rooms[n] = room
+        return room
+
+    def check_owned(self, room: 'Room'):
+        rooms = self._rooms
+        if isinstance(rooms, RoomLayers) and rooms.own.get(room.room_no) is not room:
+            raise ValueError(f'Комната {room.room_no} общая с клонами лабиринта, меняйте ее через Maze.set_side '
+                             f'или Maze.own_room')
+
+
+def _bulk(prototype: MapSite) -> bool:
+    """
+    Можно ли копировать прототип через арену. Только если его класс сам определяет clone_many: у подкласса могут быть
+    свои поля и свой clone, о которых clone_many базового класса не знает
+    """
+    return 'clone_many' in type(prototype).__dict__
+
+
+def _allocate(prototype: MapSite, n: int) -> list:
+    """
+    Арена из n пустых объектов класса прототипа. Конструктор не вызывается: поля заполняет clone_many
+    прототипа одним проходом по арене. Если класс прототипа не определяет свой clone_many, арена - это просто
+    n копий clone()
+    """
+    if not _bulk(prototype):
+        return [prototype.clone() for _ in range(n)]
+    cls, new = type(prototype), object.__new__
+    arena = [new(cls) for _ in range(n)]
+    if creation_events.enabled:
+        for _ in arena:
+            creation_events.emit(prototype)
+    return arena
+
 
 # А классы-прототипы дверей, комнат и т.д... перепишем, так как их логика поменяется сильнее
 class Wall(MapSite):
+    __slots__ = ()
+
     def __init__(self, other=None):
-        print_obj_type(other or self)
+        if creation_events.enabled:
+            creation_events.emit(other or self)
 
     def clone(self):
         return Wall(self)
 
+    def clone_many(self, n: int) -> list:
+        """n копий прототипа пачкой"""
+        return _allocate(self, n)
+
     def enter(self):
         pass
 
 
 class BombedWall(Wall):
+    __slots__ = ('durability',)
+
     def __init__(self, other=None):
         self.durability = 100
         if other:
@@ -50,15 +199,33 @@ class BombedWall(Wall):
     def clone(self):
         return BombedWall(self)
 
+    def get_state(self) -> int:
+        return self.durability
+
+    def set_state(self, state: int):
+        self.durability = state
+
+    def clone_many(self, n: int) -> list:
+        arena = super().clone_many(n)
+        durability = self.durability
+        for wall in arena:
+            wall.durability = durability
+        return arena
+
 
 class Room(MapSite):
+    __slots__ = ('navigation', 'room_no', '_maze')
+
     def __init__(self, other=None):
         self.navigation = Direction.get_navigation()
         self.room_no = None
+        self._maze = None
         if other:
-            self.navigation = other.navigation
+            # Навигацию копируем, иначе все клоны прототипа делили бы одни и те же стороны
+            self.navigation = list(other.navigation)
             self.room_no = other.room_no
-        print_obj_type(other or self)
+        if creation_events.enabled:
+            creation_events.emit(other or self)
 
     def initialize(self, no: int):
         self.room_no = no
@@ -67,24 +234,73 @@ class Room(MapSite):
         pass
 
     def get_side(self, direction: Direction) -> MapSite:
-        return self.navigation.get(direction)
+        return self.navigation[direction - 1]
 
     def set_side(self, direction: Direction, obj: MapSite):
-        self.navigation[direction] = obj
+        maze = self._maze
+        if maze is not None and maze._copy_on_write:
+            maze.check_owned(self)
+        old = self.navigation[direction - 1]
+        self.navigation[direction - 1] = obj
+        if maze is not None and (obj is not None and obj.is_door or old is not None and old.is_door):
+            maze.door_changed(self, old, obj)
 
     def clone(self):
         return Room(self)
 
+    def clone_many(self, n: int) -> list:
+        """n копий прототипа пачкой. У каждой копии своя навигация"""
+        arena = _allocate(self, n)
+        navigation, room_no = self.navigation, self.room_no
+        for room in arena:
+            room.navigation = list(navigation)
+            room.room_no = room_no
+            room._maze = None
+        return arena
+
+    def make_rooms(self, numbers: Iterable[int]) -> list:
+        """Копии прототипа с заданными номерами: clone и initialize для всех комнат разом"""
+        numbers = list(numbers)
+        arena = self.clone_many(len(numbers))
+        if not _bulk(self):
+            for room, no in zip(arena, numbers):
+                room.initialize(no)
+            return arena
+        for room, no in zip(arena, numbers):
+            room.room_no = no
+        return arena
+
 
 class RoomWithABomb(Room):
+    __slots__ = ('bomb_damage',)
+
     def __init__(self, other=None):
         self.bomb_damage = random.randint(1, 200)
         if other:
             self.bomb_damage = other.bomb_damage
-        super().__init__()
+        super().__init__(other)
+
+    def clone(self):
+        return RoomWithABomb(self)
+
+    def get_state(self) -> int:
+        return self.bomb_damage
+
+    def set_state(self, state: int):
+        self.bomb_damage = state
+
+    def clone_many(self, n: int) -> list:
+        arena = super().clone_many(n)
+        bomb_damage = self.bomb_damage
+        for room in arena:
+            room.bomb_damage = bomb_damage
+        return arena
 
 
 class Door(MapSite):
+    __slots__ = ('__room1', '__room2')
+    is_door = True
+
     def __init__(self, other=None):
         self.__room1 = None
         self.__room2 = None
@@ -94,7 +310,8 @@ class Door(MapSite):
             # и еще на англ. версии такой же
             self.__room1 = other.__room1
             self.__room2 = other.__room2
-        print_obj_type(other or self)
+        if creation_events.enabled:
+            creation_events.emit(other or self)
 
     def initialize(self, room1: Room, room2: Room):
         """Опускаем инициализацию из конструктора в отдельный метод"""
@@ -105,10 +322,78 @@ class Door(MapSite):
         """Клонировать объект"""
         return Door(self)
 
+    def clone_many(self, n: int) -> list:
+        """n копий прототипа пачкой"""
+        arena = _allocate(self, n)
+        room1, room2 = self.__room1, self.__room2
+        for door in arena:
+            door.__room1 = room1
+            door.__room2 = room2
+        return arena
+
+    def make_doors(self, pairs: Iterable[Tuple[Room, Room]]) -> list:
+        """Копии прототипа между парами комнат: clone и initialize для всех дверей разом"""
+        pairs = list(pairs)
+        arena = _allocate(self, len(pairs))
+        if not _bulk(self):
+            for door, (room1, room2) in zip(arena, pairs):
+                door.initialize(room1, room2)
+            return arena
+        for door, (room1, room2) in zip(arena, pairs):
+            door.__room1 = room1
+            door.__room2 = room2
+        return arena
+
+    def get_rooms(self):
+        """
+        Комнаты, которые соединяет дверь. Клоны лабиринта делят двери, а комнаты копируют при записи, поэтому здесь
+        может оказаться комната-оригинал, а не ее копия в лабиринте: надежны только номера комнат
+        """
+        return self.__room1, self.__room2
+
+    def other_side_from(self, room: Room):
+        """
+        Комната по другую сторону двери.
+        Комнаты сравниваются по номерам, а комната за дверью берется по номеру из лабиринта комнаты room
+        """
+        if self.__room1 is not None and room.room_no == self.__room1.room_no:
+            other = self.__room2
+        elif self.__room2 is not None and room.room_no == self.__room2.room_no:
+            other = self.__room1
+        else:
+            return None
+        maze = room._maze
+        if other is None or maze is None:
+            return other
+        return maze.get_room(other.room_no) or other
+
     def enter(self):
         print('Открыли дверь между комнатами {r1} и {r2}'.format(r1=self.__room1.number, r2=self.__room2.number))
 
 
+def _make_room(cls: type):
+    def make(no: int) -> Room:
+        room = cls()
+        room.initialize(no)
+        return room
+    return make
+
+
+def _make_door(room1: Room, room2: Room) -> Door:
+    door = Door()
+    door.initialize(room1, room2)
+    return door
+
+
+# Прототипы можно сохранять в файл и передавать в другие процессы таблицами generating/storage.py.
+# Конструкторы прототипов не принимают номер и комнаты, поэтому для них нужны свои функции создания
+register_product(Wall)
+register_product(BombedWall)
+register_product(Room, _make_room(Room))
+register_product(RoomWithABomb, _make_room(RoomWithABomb))
+register_product(Door, _make_door)
+
+
 class MazePrototypeFactory:
     def __init__(self, maze: Maze, wall: Wall, room: Room, door: Door):
         self.__prototype_maze = maze
@@ -133,20 +418,57 @@ class MazePrototypeFactory:
     def make_maze(self) -> Maze:
         return self.__prototype_maze.clone()
 
-
-# Очень интересно, что по факту мы собираем по частям нужную нам "фабрику" через наборы прототипов
-simple_maze_factory = MazePrototypeFactory(
-    Maze(), Wall(), Room(), Door()
-)
-bombed_maze_factory = MazePrototypeFactory(
-    Maze(), BombedWall(), RoomWithABomb(), Door()
-)
-# И даже так)) Хотя BombedWall и Room не сочитались раньше, тут это возможно, хоть и бесмысленно
-strange_maze_factory = MazePrototypeFactory(
-    Maze(), BombedWall(), Room(), Door()
-)
-
-
-create_maze(simple_maze_factory)
-create_maze(bombed_maze_factory)
-create_maze(strange_maze_factory)
+    # Пакетное создание продуктов, как у MazeFactory: копии прототипов создаются и инициализируются за один проход
+    def make_rooms(self, numbers: Iterable[int]) -> List[Room]:
+        return self.__prototype_room.make_rooms(numbers)
+
+    def make_walls(self, count: int) -> List[Wall]:
+        return self.__prototype_wall.clone_many(count)
+
+    def make_doors(self, pairs: Iterable[Tuple[Room, Room]]) -> List[Door]:
+        return self.__prototype_door.make_doors(pairs)
+
+
+if __name__ == '__main__':
+    # Очень интересно, что по факту мы собираем по частям нужную нам "фабрику" через наборы прототипов
+    simple_maze_factory = MazePrototypeFactory(
+        Maze(), Wall(), Room(), Door()
+    )
+    bombed_maze_factory = MazePrototypeFactory(
+        Maze(), BombedWall(), RoomWithABomb(), Door()
+    )
+    # И даже так)) Хотя BombedWall и Room не сочитались раньше, тут это возможно, хоть и бесмысленно
+    strange_maze_factory = MazePrototypeFactory(
+        Maze(), BombedWall(), Room(), Door()
+    )
+
+    create_maze(simple_maze_factory)
+    create_maze(bombed_maze_factory)
+    create_maze(strange_maze_factory)
+
+    # Измененный клон должен пережить pickle: его двери указывают на общие комнаты-оригиналы, а не на копии
+    import pickle
+
+    from generating.generator import generate_maze
+    from helpers import NullSink, creation_events
+
+    with creation_events.use(NullSink()):
+        original = generate_maze(simple_maze_factory, 5, 5, seed=1)
+        clone = original.clone()
+        changed = next(
+            (room.room_no, direction) for room in clone.get_rooms() for direction in Direction
+            if not room.get_side(direction).is_door
+        )
+        clone.set_side(*changed, Wall())
+        restored = pickle.loads(pickle.dumps(clone, 5))
+    if restored.components_count() != clone.components_count() or len(restored) != len(clone):
+        raise Exception('Клон лабиринта не пережил pickle!')
+
+    # Цепочка "клонировать и изменить": каждое поколение клона должно находить все комнаты
+    with creation_events.use(NullSink()):
+        generation = generate_maze(simple_maze_factory, 3, 3, seed=1)
+        for step in range(2000):
+            generation = generation.clone()
+            generation.set_side(step % 9 + 1, Direction.NORTH, Wall())
+    if len(generation) != 9 or None in generation.get_rooms(range(1, 10)):
+        raise Exception('Клон цепочки клонов потерял комнаты!')
@@ -0,0 +1,70 @@
+"""
+Воспроизводимый поток случайных чисел
+
+Вызов random.randint на каждый объект медленный (много Python-вызовов на число) и использует глобальный генератор,
+поэтому результат нельзя повторить. RandomStream держит свой random.Random с заданным зерном и вытягивает из него
+64-битные числа блоками одним вызовом getrandbits. Mersenne Twister выдает одни и те же 32-битные слова независимо от
+того, как их запрашивать, поэтому последовательность чисел зависит только от зерна, а не от размера блока
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import random
+import sys
+from array import array
+from typing import List, MutableSequence, Optional
+
+
+class RandomStream:
+    """Поток случайных 64-битных чисел с блочной выборкой"""
+    def __init__(self, seed: Optional[int] = None, block_size: int = 4096):
+        if block_size < 1:
+            raise ValueError('Размер блока должен быть положительным')
+        self.__random = random.Random(seed)
+        self.__block_size = block_size
+        self.__block = array('Q')
+        self.__position = 0
+
+    def __refill(self, size: int):
+        block = array('Q')
+        block.frombytes(self.__random.getrandbits(64 * size).to_bytes(8 * size, 'little'))
+        if sys.byteorder == 'big':
+            block.byteswap()
+        self.__block = block
+        self.__position = 0
+
+    def next_word(self) -> int:
+        """Следующее случайное 64-битное число"""
+        if self.__position >= len(self.__block):
+            self.__refill(self.__block_size)
+        word = self.__block[self.__position]
+        self.__position += 1
+        return word
+
+    def below(self, n: int) -> int:
+        """Случайное число от 0 до n - 1 (смещение остатка от деления для n << 2^64 пренебрежимо)"""
+        return self.next_word() % n
+
+    def words(self, count: int) -> List[int]:
+        """Следующие count случайных 64-битных чисел одним срезом"""
+        result = []
+        while count > 0:
+            if self.__position >= len(self.__block):
+                self.__refill(max(self.__block_size, min(count, 1 << 20)))
+            chunk = self.__block[self.__position:self.__position + count]
+            self.__position += len(chunk)
+            count -= len(chunk)
+            result.extend(chunk)
+        return result
+
+    def randints(self, low: int, high: int, count: int) -> List[int]:
+        """count случайных чисел от low до high включительно, как у random.randint"""
+        span = high - low + 1
+        return [low + word % span for word in self.words(count)]
+
+    def shuffle(self, items: MutableSequence):
+        """Перемешать последовательность на месте (Фишер-Йетс)"""
+        words = self.words(len(items))
+        for i in range(len(items) - 1, 0, -1):
+            j = words[i] % (i + 1)
+            items[i], items[j] = items[j], items[i]
@@ -7,22 +7,153 @@
 
 __author__ = 'Мауталиев С. И.'
 
+import asyncio
+import os
+import threading
+from types import FunctionType
+from typing import Dict, Optional
 
 # На этот раз мне надоело переписывать уже существующую логику фабрик (как я делал в примете "Прототип"),
 # поэтому реализуем только часть, ответственную за логику данного паттерна
 from generating.abstract_factory import MazeFactory, BombedMazeFactory, EnchantedMazeFactory, create_maze
 
 
+# Реестр одиночек: класс -> единственный экземпляр. Читается без блокировки, а блокировка берется только при создании.
+# Блокировка рекурсивная, потому что конструктор одиночки может создавать другие одиночки
+_instances: Dict[type, object] = {}
+_lock = threading.RLock()
+# Асинхронная инициализация одиночек AsyncSingletonMeta: класс -> задача, которая создает и инициализирует экземпляр
+_initializations: Dict[type, asyncio.Future] = {}
+
+
+class SingletonMeta(type):
+    """
+    Метакласс одиночки. Класс остается настоящим классом (работают isinstance и наследование), а вызов класса
+    возвращает единственный экземпляр. Первое создание идет под блокировкой с повторной проверкой, поэтому при гонке
+    потоков экземпляр создается ровно один раз, а дальше экземпляр берется из словаря без блокировки
+    """
+    def __call__(cls, *args, **kwargs):
+        instance = _instances.get(cls)
+        if instance is not None:
+            return instance
+        with _lock:
+            instance = _instances.get(cls)
+            if instance is None:
+                instance = _instances[cls] = super().__call__(*args, **kwargs)
+        return instance
+
+
+class AsyncSingletonMeta(SingletonMeta):
+    """
+    Метакласс одиночки с дорогой асинхронной настройкой (загрузка библиотек, прогрев кэшей и т.д...).
+    Настройка - корутина async_init экземпляра. await Класс.get_instance() возвращает настроенный экземпляр: сколько бы
+    корутин ни вызвали его одновременно, создание и настройка выполняются одной задачей ровно один раз.
+    Класс.warm_up() запускает эту задачу в фоне заранее, например при старте приложения, чтобы первый запрос не ждал.
+    Обычный вызов класса, как и у SingletonMeta, возвращает тот же экземпляр, но не ждет настройки.
+    Если настройка не удалась или ее задачу отменили (например, warm_up не дождались до закрытия цикла событий),
+    недонастроенный экземпляр забывается, и следующий get_instance создаст и настроит новый
+    """
+    async def get_instance(cls):
+        task = _initializations.get(cls)
+        if task is None:
+            # Между проверкой и записью нет await, поэтому гонки корутин здесь нет
+            task = _initializations[cls] = asyncio.ensure_future(cls.__initialize())
+            task.add_done_callback(cls.__forget_failed)
+        elif task.done() and not task.cancelled() and task.exception() is None:
+            return task.result()
+        # Отмена одной ожидающей корутины не должна отменять настройку для остальных
+        return await asyncio.shield(task)
+
+    async def __initialize(cls):
+        instance = cls()
+        initialize = getattr(instance, 'async_init', None)
+        if initialize is not None:
+            try:
+                await initialize()
+            except BaseException:
+                # Повторная настройка того же экземпляра могла бы застать его в промежуточном состоянии
+                with _lock:
+                    if _instances.get(cls) is instance:
+                        del _instances[cls]
+                raise
+        return instance
+
+    def __forget_failed(cls, task: asyncio.Future):
+        # Если настройка не удалась, следующий get_instance попробует снова
+        if task.cancelled() or task.exception() is not None:
+            if _initializations.get(cls) is task:
+                del _initializations[cls]
+
+    def warm_up(cls) -> asyncio.Future:
+        """Запустить создание и настройку экземпляра в фоне. Нужен запущенный цикл событий"""
+        return asyncio.ensure_future(cls.get_instance())
+
+
+def reset(class_: Optional[type] = None):
+    """Забыть экземпляр одиночки class_ (или всех одиночек), следующий вызов класса создаст новый"""
+    with _lock:
+        if class_ is None:
+            _instances.clear()
+            _initializations.clear()
+        else:
+            _instances.pop(class_, None)
+            _initializations.pop(class_, None)
+
+
+def _after_fork():
+    # В дочернем процессе блокировку мог держать поток, которого больше нет, а экземпляры (соединения, кэши и т.д...)
+    # принадлежат родителю. Поэтому у потомка своя блокировка и свои одиночки, которые создадутся заново
+    global _lock
+    _lock = threading.RLock()
+    _instances.clear()
+    _initializations.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _with_metaclass(class_: type, metaclass: type) -> type:
+    """
+    Пересоздать класс с метаклассом metaclass (тем же способом, что six.add_metaclass).
+    Если у класса уже свой метакласс, создается общий наследник обоих
+    """
+    meta = type(class_)
+    if issubclass(meta, metaclass):
+        return class_
+    if not issubclass(metaclass, meta):
+        meta = type(f'{metaclass.__name__}{meta.__name__}', (metaclass, meta), {})
+    else:
+        meta = metaclass
+    namespace = dict(class_.__dict__)
+    namespace.pop('__dict__', None)
+    namespace.pop('__weakref__', None)
+    slots = namespace.get('__slots__', ())
+    for name in (slots,) if isinstance(slots, str) else slots:
+        namespace.pop(name, None)
+    new_class = meta(class_.__name__, class_.__bases__, namespace)
+    # Методы с super() без аргументов ссылаются на класс через ячейку __class__, ее нужно перевести на новый класс
+    for value in namespace.values():
+        function = getattr(value, '__func__', value)
+        if isinstance(function, FunctionType) and '__class__' in function.__code__.co_freevars:
+            cell = function.__closure__[function.__code__.co_freevars.index('__class__')]
+            if cell.cell_contents is class_:
+                cell.cell_contents = new_class
+    return new_class
+
+
 # В самом учебнике более подробная реализация с наследованием, а здесь же просто декоратор навесим на класс
-def singleton(class_):
-    """Декоратор для того, чтобы класс был объявлен в приложении только единожды"""
-    instances = {}
+def singleton(class_: type) -> type:
+    """
+    Декоратор для того, чтобы класс был объявлен в приложении только единожды.
+    Класс пересоздается с метаклассом SingletonMeta, поэтому декоратор возвращает класс, а не функцию
+    """
+    return _with_metaclass(class_, SingletonMeta)
+
 
-    def getinstance(*args, **kwargs):
-        if class_ not in instances:
-            instances[class_] = class_(*args, **kwargs)
-        return instances[class_]
-    return getinstance
+def async_singleton(class_: type) -> type:
+    """Декоратор одиночки с асинхронной настройкой async_init, см. AsyncSingletonMeta"""
+    return _with_metaclass(class_, AsyncSingletonMeta)
 
 
 # По сути, в рассматриваемом примере из книги синглтон вообще и не нужен, но они просто показывают, что фабрика
@@ -50,6 +181,9 @@ if __name__ == '__main__':
         raise Exception('Not a singleton!')
     if not EnchantedFactorySingleton() is EnchantedFactorySingleton():
         raise Exception('Not a singleton!')
+    # Декоратор оставляет настоящий класс
+    if not isinstance(MazeFactorySingleton(), MazeFactorySingleton):
+        raise Exception('Not a class!')
 
     # Проверим, что основной функционал фабрик не поломался
     create_maze(MazeFactorySingleton())
@@ -0,0 +1,420 @@
+"""
+Хранение лабиринта на диске в компактном бинарном формате
+
+Чтобы не строить большой лабиринт фабриками заново при каждом запуске, его можно сохранить в файл и открыть через mmap.
+Открытие почти мгновенное: файл не читается целиком, а комнаты создаются только при первом обращении к ним.
+
+Формат файла (все числа little-endian):
+ - заголовок: сигнатура MAZE, версия, размер таблицы типов, количество комнат и сторон
+ - таблица типов: имена классов продуктов (Room, BombedWall, EnchantedDoor и т.д...) через перевод строки,
+   дополненная нулями до кратного 8 размера
+ - таблица комнат, отсортированная по номеру: номер (int64), тип, состояние и 4 стороны (int32).
+   Сторона - индекс в таблице сторон, -1 - стороны нет
+ - таблица сторон: тип, состояние и 2 комнаты двери (int32, индексы в таблице комнат, -1 - комнаты нет)
+
+Состояние продукта (прочность BombedWall, заклинание EnchantedDoor и т.д...) упаковывается в число методами
+get_state/set_state. Классы продуктов должны быть зарегистрированы в PRODUCT_TYPES, так при загрузке не импортируется
+ничего, кроме заранее известных классов
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import io
+import mmap
+import os
+import pickle
+import struct
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, NoReturn, Optional, Tuple, Union
+
+from generating.abstract_factory import EnchantedRoom, EnchantedDoor, BombedWall, RoomWithBomb
+from generating.common import Direction, MapSite, Maze, Room, Wall, Door
+
+
+MAGIC = b'MAZE'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIqq')
+ROOM_RECORD = struct.Struct('<qii4i')
+SIDE_RECORD = struct.Struct('<iiii')
+ROOM_NO = struct.Struct('<q')
+NO_REF = -1
+
+# Зарегистрированные продукты: имя класса -> (класс, функция создания).
+# Функция создания комнаты принимает номер, стены - ничего, двери - две комнаты
+PRODUCT_TYPES: Dict[str, Tuple[type, Callable[..., MapSite]]] = {}
+
+
+def product_name(cls: type) -> str:
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def register_product(cls: type, make: Optional[Callable[..., MapSite]] = None) -> type:
+    """
+    Зарегистрировать класс продукта, чтобы его можно было сохранять и загружать
+    :param cls: класс продукта
+    :param make: функция создания, по умолчанию - конструктор класса
+    :return: класс (можно использовать как декоратор)
+    """
+    PRODUCT_TYPES[product_name(cls)] = (cls, make or cls)
+    return cls
+
+
+for _product in (Room, Wall, Door, EnchantedRoom, EnchantedDoor, BombedWall, RoomWithBomb):
+    register_product(_product)
+
+
+@dataclass
+class MazeTables:
+    """Лабиринт, разложенный в плоские таблицы формата файла"""
+    types: List[str]
+    rooms: bytearray
+    sides: bytearray
+
+    @property
+    def rooms_count(self) -> int:
+        return len(self.rooms) // ROOM_RECORD.size
+
+    @property
+    def sides_count(self) -> int:
+        return len(self.sides) // SIDE_RECORD.size
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def flatten(maze: Maze, types: Optional[List[str]] = None) -> MazeTables:
+    """
+    Разложить лабиринт в плоские таблицы. Обход итеративный, поэтому глубина графа комнат не важна
+    :param maze: лабиринт
+    :param types: начальная таблица типов. Если у нескольких лабиринтов она одна, их таблицы можно склеивать
+    :return: таблицы
+    """
+    rooms = sorted(maze.get_rooms(), key=attrgetter('room_no'))
+    # Комнаты дверей ищутся по номеру, а не по объекту: у клонов лабиринта (generating/prototype.py) дверь может
+    # указывать на общую комнату-оригинал, а в лабиринте лежит ее копия
+    room_index = {room.room_no: index for index, room in enumerate(rooms)}
+    types = list(types or ())
+    type_ids: Dict[type, int] = {
+        PRODUCT_TYPES[name][0]: index for index, name in enumerate(types) if name in PRODUCT_TYPES
+    }
+    side_index: Dict[int, int] = {}
+    room_table = bytearray(ROOM_RECORD.size * len(rooms))
+    side_table = bytearray()
+
+    def type_id(obj: MapSite) -> int:
+        cls = type(obj)
+        result = type_ids.get(cls)
+        if result is None:
+            name = product_name(cls)
+            if name not in PRODUCT_TYPES:
+                raise ValueError(f'Класс {name} не зарегистрирован, используйте register_product')
+            result = type_ids[cls] = len(types)
+            types.append(name)
+        return result
+
+    for index, room in enumerate(rooms):
+        refs = []
+        for direction in Direction:
+            side = room.get_side(direction)
+            if side is None:
+                refs.append(NO_REF)
+                continue
+            # Одна и та же дверь (или общая стена) записывается один раз
+            ref = side_index.get(id(side))
+            if ref is None:
+                ref = side_index[id(side)] = len(side_index)
+                room1 = room2 = NO_REF
+                if side.is_door:
+                    room1, room2 = (
+                        NO_REF if r is None else room_index.get(r.room_no, NO_REF) for r in side.get_rooms()
+                    )
+                side_table += SIDE_RECORD.pack(type_id(side), side.get_state(), room1, room2)
+            refs.append(ref)
+        ROOM_RECORD.pack_into(
+            room_table, index * ROOM_RECORD.size, room.room_no, type_id(room), room.get_state(), *refs
+        )
+    return MazeTables(types, room_table, side_table)
+
+
+def write_tables(tables: MazeTables, file) -> NoReturn:
+    """Записать таблицы в открытый бинарный файл"""
+    types = '\n'.join(tables.types).encode()
+    file.write(HEADER.pack(MAGIC, VERSION, 0, len(types), 0, tables.rooms_count, tables.sides_count))
+    file.write(types.ljust(_aligned(len(types)), b'\0'))
+    file.write(tables.rooms)
+    file.write(tables.sides)
+
+
+def tables_to_bytes(tables: MazeTables) -> bytes:
+    """Таблицы в формате файла, например для передачи между процессами"""
+    buffer = io.BytesIO()
+    write_tables(tables, buffer)
+    return buffer.getvalue()
+
+
+def save_maze(maze: Maze, path: str) -> NoReturn:
+    """Сохранить лабиринт в файл"""
+    tables = flatten(maze)
+    with open(path, 'wb') as file:
+        write_tables(tables, file)
+
+
+def load_maze(path: str) -> 'MappedMaze':
+    """Открыть сохраненный лабиринт. Комнаты создаются при первом обращении"""
+    return MappedMaze(path)
+
+
+def restore_maze(cls: type, data) -> Maze:
+    """
+    Восстановить лабиринт класса cls из буфера в формате файла (для pickle, см. Maze.__reduce_ex__).
+    MappedMaze остается ленивым поверх буфера, лабиринты других классов собираются из всех комнат буфера
+    """
+    # Буфер, переданный вне основного потока, приходит как PickleBuffer
+    mapped = MappedMaze(memoryview(data))
+    if cls is MappedMaze:
+        return mapped
+    maze = cls()
+    maze.add_rooms(mapped.get_rooms())
+    return maze
+
+
+def share_maze(maze: Maze) -> shared_memory.SharedMemory:
+    """
+    Положить лабиринт в разделяемую память, чтобы процессы-исполнители открывали его без копирования (attach_maze).
+    Закрыть и удалить (unlink) разделяемую память должен вызывающий
+    """
+    data = tables_to_bytes(flatten(maze))
+    shared = shared_memory.SharedMemory(create=True, size=len(data))
+    shared.buf[:len(data)] = data
+    return shared
+
+
+def attach_maze(name: str) -> 'MappedMaze':
+    """Открыть лабиринт из разделяемой памяти по имени. Комнаты создаются при первом обращении"""
+    return MappedMaze(shared_memory.SharedMemory(name=name))
+
+
+class MappedMaze(Maze):
+    """
+    Лабиринт, отображенный из файла через mmap (или поверх готового буфера в формате файла, в том числе разделяемой
+    памяти).
+    Комната создается фабричными классами при первом обращении через get_room/get_rooms. Комнаты за дверями
+    создаются сразу (чтобы дверь могла на них ссылаться), но их стороны заполняются, когда к ним обратятся через
+    лабиринт.
+    Если передана фабрика (make_room/make_wall/make_door), продукты создает она, а из буфера берется только состояние.
+    Так сохраняется поведение фабрики, например общая стена MazeFactory(pooled=True)
+    """
+    def __init__(self, source: Union[str, os.PathLike, bytes, bytearray, memoryview, shared_memory.SharedMemory],
+                 factory=None):
+        super().__init__()
+        self.__factory = factory
+        self.__shared = None
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                self.__buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        elif isinstance(source, shared_memory.SharedMemory):
+            self.__shared = source
+            self.__buffer = source.buf
+        else:
+            self.__buffer = source
+        magic, version, _, types_size, _, rooms_count, _ = HEADER.unpack_from(self.__buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Буфер не является лабиринтом версии {VERSION}')
+        names = bytes(self.__buffer[HEADER.size:HEADER.size + types_size]).decode().split('\n') if types_size else []
+        for name in names:
+            if name not in PRODUCT_TYPES:
+                raise ValueError(f'Класс {name} не зарегистрирован, используйте register_product')
+        self.__types = [PRODUCT_TYPES[name] for name in names]
+        self.__rooms_offset = HEADER.size + _aligned(types_size)
+        self.__sides_offset = self.__rooms_offset + rooms_count * ROOM_RECORD.size
+        self.__rooms_count = rooms_count
+        # Созданные комнаты по индексу в таблице. Комнаты из __pending созданы, но их стороны еще не заполнены
+        self.__loaded: Dict[int, Room] = {}
+        self.__pending = set()
+        self.__doors: Dict[int, MapSite] = {}
+        # Номера удаленных комнат из файла и количество комнат, добавленных сверх файла
+        self.__removed = set()
+        self.__extra = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Закрыть отображение файла или разделяемой памяти. Уже созданные комнаты остаются доступны"""
+        if isinstance(self.__buffer, mmap.mmap):
+            self.__buffer.close()
+        elif self.__shared is not None:
+            self.__shared.close()
+
+    def __reduce_ex__(self, protocol):
+        # Пока комнаты не создавались и не менялись, буфер и есть лабиринт: он передается без разбора на таблицы
+        if self.__loaded or self.__removed or self.__extra:
+            return super().__reduce_ex__(protocol)
+        data = self.__buffer
+        return restore_maze, (MappedMaze, pickle.PickleBuffer(data) if protocol >= 5 else bytes(data))
+
+    def __copy__(self):
+        # Комнаты за дверями, стороны которых еще не заполнены, достраиваются до копирования. Иначе копия и оригинал
+        # заполняли бы стороны одной и той же комнаты каждый своими дверями
+        for index in list(self.__pending):
+            self.__materialize(index)
+        maze = super().__copy__()
+        maze.__loaded = dict(self.__loaded)
+        maze.__pending = set()
+        maze.__doors = dict(self.__doors)
+        maze.__removed = set(self.__removed)
+        return maze
+
+    def __len__(self) -> int:
+        return self.__rooms_count - len(self.__removed) + self.__extra
+
+    def __contains__(self, n: int) -> bool:
+        return super().__contains__(n) or self.__in_file(n)
+
+    def __room_no(self, index: int) -> int:
+        return ROOM_NO.unpack_from(self.__buffer, self.__rooms_offset + index * ROOM_RECORD.size)[0]
+
+    def __find(self, n: int) -> Optional[int]:
+        """Двоичный поиск комнаты в таблице, отсортированной по номеру"""
+        low, high = 0, self.__rooms_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__room_no(middle) < n:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.__rooms_count and self.__room_no(low) == n:
+            return low
+        return None
+
+    def __in_file(self, n: int) -> bool:
+        return n not in self.__removed and self.__find(n) is not None
+
+    def __shell(self, index: int) -> Room:
+        """Создать комнату без сторон"""
+        room = self.__loaded.get(index)
+        if room is None:
+            offset = self.__rooms_offset + index * ROOM_RECORD.size
+            no, type_, state = ROOM_RECORD.unpack_from(self.__buffer, offset)[:3]
+            if self.__factory is None:
+                room = self.__types[type_][1](no)
+                room.set_state(state)
+            else:
+                room = self.__restore(self.__factory.make_room(no), state)
+            self.__loaded[index] = room
+            self.__pending.add(index)
+        return room
+
+    def __side(self, ref: int) -> MapSite:
+        door = self.__doors.get(ref)
+        if door is not None:
+            return door
+        offset = self.__sides_offset + ref * SIDE_RECORD.size
+        type_, state, room1, room2 = SIDE_RECORD.unpack_from(self.__buffer, offset)
+        cls, make = self.__types[type_]
+        if self.__factory is not None:
+            if cls.is_door:
+                make = self.__factory.make_door
+            else:
+                make = self.__factory.make_wall
+        if cls.is_door:
+            side = self.__doors[ref] = make(*(None if r == NO_REF else self.__shell(r) for r in (room1, room2)))
+        else:
+            # Стены не кэшируются: у каждой комнаты своя, как и при постройке фабрикой (или общая, если так решит
+            # фабрика)
+            side = make()
+        if self.__factory is None:
+            side.set_state(state)
+        else:
+            side = self.__restore(side, state)
+            if cls.is_door:
+                self.__doors[ref] = side
+        return side
+
+    @staticmethod
+    def __restore(product: MapSite, state: int) -> MapSite:
+        if product.get_state() == state:
+            return product
+        # Общий продукт пула фабрики менять нельзя. Его состояние отличается от сохраненного, если продукт был
+        # скопирован при записи (например, взорванная BombedWall), поэтому состояние получает собственная копия
+        if getattr(product, 'shared', False):
+            product = product.copy()
+        product.set_state(state)
+        return product
+
+    def __materialize(self, index: int) -> Room:
+        room = self.__shell(index)
+        if index in self.__pending:
+            refs = ROOM_RECORD.unpack_from(self.__buffer, self.__rooms_offset + index * ROOM_RECORD.size)[3:]
+            for direction, ref in zip(Direction, refs):
+                if ref != NO_REF:
+                    room.set_side(direction, self.__side(ref))
+            self.__pending.discard(index)
+            super().add_room(room)
+        return room
+
+    def room_numbers(self) -> Iterator[int]:
+        """Номера комнат из файла (без чтения самих комнат) и добавленных после загрузки"""
+        for index in range(self.__rooms_count):
+            no = self.__room_no(index)
+            if no not in self.__removed:
+                yield no
+        for room in super().get_rooms():
+            if self.__find(room.room_no) is None or room.room_no in self.__removed:
+                yield room.room_no
+
+    def materialize_all(self) -> NoReturn:
+        """Создать все комнаты файла"""
+        for index in range(self.__rooms_count):
+            if self.__room_no(index) not in self.__removed:
+                self.__materialize(index)
+
+    def get_room(self, n: int) -> Optional[Room]:
+        room = super().get_room(n)
+        if room is not None or n in self.__removed:
+            return room
+        index = self.__find(n)
+        return None if index is None else self.__materialize(index)
+
+    def get_rooms(self, numbers=None) -> List[Optional[Room]]:
+        if numbers is None:
+            self.materialize_all()
+            return super().get_rooms()
+        return [self.get_room(n) for n in numbers]
+
+    def add_room(self, room: Room) -> NoReturn:
+        if self.__in_file(room.room_no):
+            raise ValueError(f'Комната с номером {room.room_no} уже есть в лабиринте')
+        super().add_room(room)
+        self.__extra += 1
+
+    def add_rooms(self, rooms) -> NoReturn:
+        rooms = list(rooms)
+        for room in rooms:
+            if self.__in_file(room.room_no):
+                raise ValueError(f'Комната с номером {room.room_no} уже есть в лабиринте')
+        super().add_rooms(rooms)
+        self.__extra += len(rooms)
+
+    def remove_room(self, n: int) -> Room:
+        self.get_room(n)
+        room = super().remove_room(n)
+        if self.__find(n) is not None and n not in self.__removed:
+            self.__removed.add(n)
+        else:
+            self.__extra -= 1
+        return room
+
+    def is_connected(self, n1: int, n2: int) -> bool:
+        self.materialize_all()
+        return super().is_connected(n1, n2)
+
+    def components_count(self) -> int:
+        self.materialize_all()
+        return super().components_count()
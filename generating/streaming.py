@@ -0,0 +1,116 @@
+"""
+Потоковая постройка лабиринта
+
+create_maze из abstract_factory.py и builder.py держат в памяти весь лабиринт до конца постройки. Здесь лабиринт
+описывается потоком порций (MazeChunk): какие комнаты построить и какие двери между ними поставить. Порции потребляет
+любой строитель из builder.py, то есть интерфейс MazeBuilder и есть интерфейс приемника:
+ - CoordinateMazeBuilder собирает лабиринт-сетку в памяти, ставя двери на противоположные стороны соседних комнат
+   (StandardMazeBuilder для сеток не подходит: у комнаты сетки дверей больше, чем общих свободных сторон)
+ - FileMazeBuilder пишет команды постройки в файл
+ - CountingMazeBuilder только считает комнаты и двери
+
+Генератор stream_maze строит лабиринт алгоритмом Sidewinder строка за строкой. Ему нужно помнить лишь текущую
+строку, поэтому рабочий набор ограничен размером порции, и можно строить лабиринты больше, чем помещается в память
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from generating.builder import MazeBuilder
+from generating.randomness import RandomStream
+
+
+@dataclass
+class MazeChunk:
+    """Порция постройки: номера новых комнат и двери (пары номеров комнат)"""
+    rooms: List[int] = field(default_factory=list)
+    doors: List[Tuple[int, int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.rooms) + len(self.doors)
+
+
+def stream_maze(width: int, height: int, seed: Optional[int] = None, chunk_rows: int = 64,
+                first_room: int = 1) -> Iterator[MazeChunk]:
+    """
+    Сгенерировать лабиринт W x H порциями (алгоритм Sidewinder).
+    Нумерация комнат такая же, как в generating/generator.py: first_room + y * width + x.
+    Двери порции ведут только в комнаты этой же порции или предыдущих, поэтому порцию можно сразу отдавать строителю
+    :param chunk_rows: сколько строк сетки в одной порции
+    """
+    if width < 1 or height < 1:
+        raise ValueError('Размеры лабиринта должны быть положительными')
+    stream = RandomStream(seed)
+    chunk = MazeChunk()
+    for y in range(height):
+        row = first_room + y * width
+        chunk.rooms.extend(range(row, row + width))
+        if y == 0:
+            # Первая строка - сплошной коридор
+            chunk.doors.extend((room, room + 1) for room in range(row, row + width - 1))
+        else:
+            # Остальные строки разбиваются на отрезки, каждый отрезок соединяется со строкой выше одной дверью
+            run_start = row
+            for room in range(row, row + width):
+                if room == row + width - 1 or stream.below(2):
+                    north = run_start + stream.below(room - run_start + 1)
+                    chunk.doors.append((north - width, north))
+                    run_start = room + 1
+                else:
+                    chunk.doors.append((room, room + 1))
+        if (y + 1) % chunk_rows == 0:
+            yield chunk
+            chunk = MazeChunk()
+    if chunk.rooms:
+        yield chunk
+
+
+def read_chunks(file: TextIO, chunk_size: int = 65536) -> Iterator[MazeChunk]:
+    """Прочитать порциями команды постройки, записанные FileMazeBuilder"""
+    chunk = MazeChunk()
+    for line in file:
+        kind, *numbers = line.split()
+        if kind == 'room':
+            chunk.rooms.append(int(numbers[0]))
+        elif kind == 'door':
+            chunk.doors.append((int(numbers[0]), int(numbers[1])))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = MazeChunk()
+    if len(chunk):
+        yield chunk
+
+
+def consume(chunks: Iterable[MazeChunk], builder: MazeBuilder):
+    """
+    Передать поток порций строителю
+    :return: результат builder.get_maze()
+    """
+    builder.build_maze()
+    build_room, build_door = builder.build_room, builder.build_door
+    for chunk in chunks:
+        for room_no in chunk.rooms:
+            build_room(room_no)
+        for room1, room2 in chunk.doors:
+            build_door(room1, room2)
+    return builder.get_maze()
+
+
+if __name__ == '__main__':
+    import io
+
+    from generating.builder import CoordinateMazeBuilder, CountingMazeBuilder, FileMazeBuilder
+    from generating.generator import room_coordinates
+    from helpers import NullSink, creation_events
+
+    counter = CountingMazeBuilder()
+    consume(stream_maze(2000, 2000, seed=1), counter)
+
+    buffer = io.StringIO()
+    consume(stream_maze(10, 10, seed=1), FileMazeBuilder(buffer))
+    buffer.seek(0)
+    with creation_events.use(NullSink()):
+        maze = consume(read_chunks(buffer), CoordinateMazeBuilder(lambda no: room_coordinates(no, 10)))
+    print(f'Из файла собран лабиринт из {len(maze)} комнат, компонент связности: {maze.components_count()}')
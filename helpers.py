@@ -5,6 +5,9 @@
 __author__ = 'Мауталиев С. И.'
 
 
+import logging
+from collections import Counter
+from contextlib import contextmanager
 from typing import Callable, Optional, Any
 
 
@@ -27,3 +30,100 @@ def except_error(return_value: Optional[Any] = None):
 
 def print_obj_type(object_: Any):
     print(f'Создан экземпляр класса {type(object_)}')
+
+
+class CreationSink:
+    """
+    Приемник событий создания объектов (комнат, стен, дверей и т.д...). Базовый ничего не делает.
+    Флаг enabled проверяется в конструкторах до вызова emit, поэтому выключенный приемник почти ничего не стоит
+    """
+    enabled = False
+
+    def emit(self, object_: Any):
+        """Обработать событие создания объекта"""
+
+
+class NullSink(CreationSink):
+    """Приемник, который игнорирует события - для боевых сборок больших лабиринтов"""
+
+
+class PrintSink(CreationSink):
+    """Приемник, который печатает каждое событие (поведение по умолчанию, удобно для примеров)"""
+    enabled = True
+
+    def emit(self, object_: Any):
+        print_obj_type(object_)
+
+
+class CountingSink(CreationSink):
+    """Приемник, который считает созданные объекты по классам"""
+    enabled = True
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def emit(self, object_: Any):
+        self.counts[type(object_)] += 1
+
+
+class BufferedLogSink(CreationSink):
+    """Приемник, который копит события в буфере и пишет их в лог пачками"""
+    enabled = True
+
+    def __init__(self, logger: Optional[logging.Logger] = None, capacity: int = 1024, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.capacity = capacity
+        self.level = level
+        self.buffer = []
+
+    def emit(self, object_: Any):
+        self.buffer.append(type(object_))
+        if len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self):
+        """Записать накопленные события в лог"""
+        if self.buffer and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '\n'.join(f'Создан экземпляр класса {type_}' for type_ in self.buffer))
+        self.buffer.clear()
+
+
+class CallbackSink(CreationSink):
+    """Приемник, который передает каждый созданный объект в функцию"""
+    enabled = True
+
+    def __init__(self, callback: Callable[[Any], Any]):
+        self.emit = callback
+
+
+class CreationEvents:
+    """Диспетчер событий создания объектов. Приемник можно подменить в любой момент"""
+    def __init__(self, sink: CreationSink):
+        self.sink = self.emit = None
+        self.enabled = False
+        self.set_sink(sink)
+
+    def set_sink(self, sink: CreationSink) -> CreationSink:
+        """
+        Установить приемник событий
+        :param sink: новый приемник
+        :return: предыдущий приемник
+        """
+        previous = self.sink
+        self.sink = sink
+        self.emit = sink.emit
+        self.enabled = sink.enabled
+        return previous
+
+    @contextmanager
+    def use(self, sink: CreationSink):
+        """Временно установить приемник событий"""
+        previous = self.set_sink(sink)
+        try:
+            yield sink
+        finally:
+            self.set_sink(previous)
+
+
+# Конструкторы частей лабиринта сообщают о себе сюда. По умолчанию события печатаются, как и раньше
+creation_events = CreationEvents(PrintSink())
@@ -107,10 +107,14 @@ def application_simulator(shape: Shape):
     print('\n\n')
 
 
-# Приложение для обычных фигур работает так
-just_shape = Shape()
-application_simulator(just_shape)
+if __name__ == '__main__':
+    # Приложение для обычных фигур работает так
+    just_shape = Shape()
+    application_simulator(just_shape)
 
-# А вот так приложение будет работать для новой фигуры с текстом, для которой под капотом используется сторонее решение
-text_shape = TextShape(TextView())
-application_simulator(text_shape)
+    # А вот так приложение будет работать для новой фигуры с текстом, для которой под капотом используется сторонее
+    # решение
+    text_shape = TextShape(TextView())
+    application_simulator(text_shape)
+
+    # Пакетный адаптер для множества фигур сразу - structural/adapter_batch.py
@@ -0,0 +1,93 @@
+"""
+Паттерн "Адаптер" для множества фигур сразу
+
+ Подробности см. в книге "Паттерны объектно-ориентированного проектирования" Э. Гамма и др., 2022
+ Паттерн "Адаптер" - с. 171
+
+TextShape из structural/adapter.py адаптирует одну пару Point к одному TextView. Когда фигур миллионы, вызов на
+каждую слишком дорог, поэтому здесь TextView хранятся колонками в массиве NumPy, а адаптер заполняет их для всех
+фигур одной операцией. Отдельный модуль - чтобы пример из adapter.py работал и без NumPy
+"""
+
+__author__ = 'Мауталиев С. И.'
+
+import numpy as np
+
+from structural.adapter import Shape
+
+
+class TextViewStore:
+    """
+    Колоночное хранилище TextView для множества фигур с тем же интерфейсом, что и у TextView.
+    Все поля лежат в одном массиве (4, size): строки x, y, weight, height, а i-й столбец - это i-й TextView.
+    Методы принимают массивы значений и пишут их в срез фигур [start, start + n), не создавая объектов на фигуру
+    """
+    X, Y, WEIGHT, HEIGHT = range(4)
+
+    def __init__(self, size: int, dtype=np.int64):
+        self.__data = np.zeros((4, size), dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.__data.shape[1]
+
+    def __columns(self, start: int, n: int) -> slice:
+        if start < 0 or start + n > len(self):
+            raise ValueError(f'Фигуры [{start}, {start + n}) не помещаются в хранилище на {len(self)} фигур')
+        return slice(start, start + n)
+
+    def get_origin(self, x, y, start: int = 0):
+        """Определить начальные точки фигур"""
+        x, y = np.asarray(x), np.asarray(y)
+        self.__data[self.X:self.Y + 1, self.__columns(start, x.shape[-1])] = x, y
+
+    def get_extend(self, height, weight, start: int = 0):
+        """Определить высоты и ширины фигур"""
+        height, weight = np.asarray(height), np.asarray(weight)
+        self.__data[self.WEIGHT:self.HEIGHT + 1, self.__columns(start, weight.shape[-1])] = weight, height
+
+    def set_boxes(self, bottom_left, top_right, start: int = 0):
+        """
+        Заполнить хранилище сразу по углам прямоугольников: массивы (2, n) со строками x и y.
+        Начальные точки копируются одним присваиванием, а ширины и высоты считаются одним вычитанием сразу в хранилище
+        """
+        bottom_left = np.asarray(bottom_left)
+        columns = self.__columns(start, bottom_left.shape[-1])
+        self.__data[self.X:self.Y + 1, columns] = bottom_left
+        np.subtract(top_right, bottom_left, out=self.__data[self.WEIGHT:self.HEIGHT + 1, columns], casting='unsafe')
+
+    def get_info(self, i: int = None) -> np.ndarray:
+        """
+        Представление (view) хранилища без копирования: массив (4, size) строк x, y, weight, height
+        или столбец (x, y, weight, height) фигуры i
+        """
+        if i is None:
+            return self.__data.view()
+        return self.__data[:, i]
+
+
+class TextShapeBatch(Shape):
+    """
+    Пакетный адаптер TextShape: адаптирует сразу множество фигур к колоночному TextViewStore.
+    Вместо пары Point bounding_box принимает массивы (2, n) углов прямоугольников со строками x и y
+    """
+    def __init__(self, text_views: TextViewStore):
+        self.text_views = text_views
+        super(TextShapeBatch, self).__init__()
+
+    def bounding_box(self, bottom_left, top_right, start: int = 0):
+        """Одна операция NumPy на все фигуры вместо вызова TextShape.bounding_box на каждую"""
+        self.text_views.set_boxes(bottom_left, top_right, start)
+
+    def create_manipulator(self):
+        return super().create_manipulator()
+
+    def check_state(self):
+        print(self.text_views.get_info())
+
+
+if __name__ == '__main__':
+    # Углы прямоугольников передаются массивами (2, n): строка x и строка y
+    shapes = TextShapeBatch(TextViewStore(3))
+    shapes.bounding_box(np.array([[0, 1, 2], [0, 1, 2]]), np.array([[10, 5, 4], [10, 7, 3]]))
+    shapes.create_manipulator()
+    shapes.check_state()
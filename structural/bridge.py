@@ -4,10 +4,12 @@
  Подробности см. в книге "Паттерны объектно-ориентированного проектирования" Э. Гамма и др., 2022
  Паттерн "Мост" - с. 184
 """
+import asyncio
 import random
+import threading
 from abc import ABCMeta, abstractmethod
 
-from generating.singleton import singleton
+from generating.singleton import async_singleton
 
 
 class Window:
@@ -144,7 +146,7 @@ class PMWindowImp(WindowImp):
         pass
 
 
-@singleton
+@async_singleton
 class WindowSystemFactory:
     """
     Пример, как могут сочетаться паттерны - WindowSystemFactory должна быть одна, поэтому сделаем ее "Одиночкой"
@@ -152,13 +154,35 @@ class WindowSystemFactory:
     очень упрощенно
     Пример паттерна "Абстрактная фабрика" - generating/abstract_factory.py
     Пример паттерна "Одиночка" - generating/singleton.py
+
+    Загрузка реализаций оконных систем считается дорогой, поэтому ее можно выполнить заранее и не в цикле событий:
+    await WindowSystemFactory.get_instance() или WindowSystemFactory.warm_up() при старте приложения.
+    Если этого не сделали, реализации загрузятся при первом запросе
     """
-    imps = {
-        'X': XWindowImp(),
-        'PM': PMWindowImp(),
-    }
+    def __init__(self):
+        self.imps = None
+        # load может одновременно выполняться в потоке async_init и в синхронном вызове
+        self.__lock = threading.Lock()
+
+    def load(self):
+        """Загрузить реализации оконных систем. Загрузка выполняется ровно один раз, остальные вызовы ждут ее"""
+        if self.imps is not None:
+            return
+        with self.__lock:
+            if self.imps is None:
+                self.imps = {
+                    'X': XWindowImp(),
+                    'PM': PMWindowImp(),
+                }
+
+    async def async_init(self):
+        # Загрузка идет в отдельном потоке, чтобы не блокировать цикл событий
+        await asyncio.to_thread(self.load)
 
     def get_implementation_for_system(self):
+        # Если фабрику не прогрели заранее, синхронный вызов загружает реализации сам (и блокирует цикл событий,
+        # если он есть), а если загрузка уже идет в async_init - дожидается ее
+        self.load()
         return random.choice(list(self.imps.values()))
 
 
@@ -180,7 +204,13 @@ def check_result(window: Window):
 # А теперь представим, что нужно доработать наши окна под MacOS. Для этого с паттерном Мост мы напишем лишь 1 класс:
 # MacWindowImp, а если бы не был использован паттерн, то пришлось бы писать MacWindow, MacApplicationWindow и
 # MacIconWindow
-if __name__ == '__main__':
+
+
+async def main():
+    # При старте приложения фабрика оконных систем загружается в фоне, пока цикл событий занят остальной подготовкой
+    warming = WindowSystemFactory.warm_up()
+    await asyncio.sleep(0)  # остальная подготовка приложения
+    await warming
     for window_class in (Window, ApplicationWindow, IconWindow):
         checked_systems = set()
         while len(checked_systems) < 2:
@@ -188,3 +218,7 @@ if __name__ == '__main__':
             if window_.implementation_name not in checked_systems:
                 checked_systems.add(window_.implementation_name)
                 check_result(window_)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())